@@ -0,0 +1,227 @@
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from graph import Graph, AddNode, AddSegment, DeleteNode, DeleteSegment, GetClosest, LoadGraphFromFile, \
+    SaveGraphToFile
+from node import Node
+try:
+    import resource
+except ImportError:
+    resource = None  # Not available on Windows; the peak resident memory is then left out.
+# `random` drives the seeded graph generators, so every run of a size builds exactly the same graph.
+# `time`, `tracemalloc` and `resource` (when available) measure the time and memory taken by each operation.
+# `json` writes the results so runs of different releases can be compared.
+# Run it with: python benchmark.py --sizes 1000 10000 100000 --output results.json
+
+GENERATORS = {}
+
+
+def Generator(name):
+    # Registers a generator function under 'name' so it can be chosen from the command line.
+    def Register(function):
+        GENERATORS[name] = function
+        return function
+    return Register
+
+
+@Generator('geometric')
+def RandomGeometricGraph(n, seed=0, radius=1.2):
+    # n nodes spread uniformly over a square of area n (one node per unit of area on average), with a segment in each
+    # direction between every pair of nodes closer than 'radius'. With the default radius each node has about 4.5
+    # segments leaving it, like a road network.
+    # Returns (nodes, segments): lists of (name, x, y) and (id, origin name, destination name).
+    rng = random.Random(seed)
+    side = math.sqrt(n)
+    nodes = [(f"N{i}", rng.uniform(0, side), rng.uniform(0, side)) for i in range(n)]
+    # Nodes are bucketed in cells of size 'radius', so only the 3 x 3 cells around a node need to be checked.
+    cells = {}
+    for i, (_, x, y) in enumerate(nodes):
+        cells.setdefault((int(x // radius), int(y // radius)), []).append(i)
+    segments = []
+    limit = radius * radius
+    for (cx, cy), members in cells.items():
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for j in cells.get((cx + dx, cy + dy), ()):
+                    _, xj, yj = nodes[j]
+                    for i in members:
+                        if i != j:
+                            _, xi, yi = nodes[i]
+                            if (xi - xj) ** 2 + (yi - yj) ** 2 <= limit:
+                                segments.append((f"S{len(segments)}", nodes[i][0], nodes[j][0]))
+    return nodes, segments
+
+
+@Generator('grid')
+def GridGraph(n, seed=0):
+    # About n nodes on a square grid with unit spacing, joined to their four neighbors in both directions.
+    # 'seed' is not used: the grid is always the same.
+    width = max(1, round(math.sqrt(n)))
+    height = max(1, n // width)
+    nodes = [(f"N{i}", i % width, i // width) for i in range(width * height)]
+    segments = []
+    for i in range(width * height):
+        x, y = i % width, i // width
+        for j in ((i + 1) if x + 1 < width else None, (i + width) if y + 1 < height else None):
+            if j is not None:
+                segments.append((f"S{len(segments)}", f"N{i}", f"N{j}"))
+                segments.append((f"S{len(segments)}", f"N{j}", f"N{i}"))
+    return nodes, segments
+
+
+@Generator('scalefree')
+def ScaleFreeGraph(n, seed=0, links=2):
+    # n nodes at random positions joined by preferential attachment (Barabasi-Albert): each new node links to
+    # 'links' existing nodes chosen with probability proportional to their degree, in both directions.
+    # A few hubs end up with very many segments, which is the worst case for per-node operations.
+    rng = random.Random(seed)
+    side = math.sqrt(n)
+    nodes = [(f"N{i}", rng.uniform(0, side), rng.uniform(0, side)) for i in range(n)]
+    segments = []
+    ends = list(range(min(links, n)))  # Every node appears here once per segment touching it.
+    for i in range(links, n):
+        targets = set()
+        while len(targets) < links:
+            targets.add(rng.choice(ends))
+        for j in targets:
+            segments.append((f"S{len(segments)}", f"N{i}", f"N{j}"))
+            segments.append((f"S{len(segments)}", f"N{j}", f"N{i}"))
+            ends.extend((i, j))
+    return nodes, segments
+
+
+def BuildGraph(nodes, segments):
+    # Builds a Graph from the lists returned by a generator, one AddNode and AddSegment call per item.
+    g = Graph()
+    for name, x, y in nodes:
+        AddNode(g, Node(name, x, y))
+    for segment_id, origin, destination in segments:
+        AddSegment(g, segment_id, origin, destination)
+    return g
+
+
+def Measure(results, row, operation, count, function):
+    # Runs 'function' once, timing it, and appends a result for 'count' calls of 'operation'. Returns its result.
+    start = time.perf_counter()
+    value = function()
+    seconds = time.perf_counter() - start
+    results.append(dict(row, operation=operation, count=count, seconds=round(seconds, 6),
+                        per_call_us=round(1e6 * seconds / max(count, 1), 3)))
+    return value
+
+
+def PeakMemory(nodes, segments):
+    # Returns the peak number of bytes allocated while building the graph, measured with tracemalloc.
+    # It runs on a separate build because tracemalloc slows the timed operations down.
+    tracemalloc.start()
+    g = BuildGraph(nodes, segments)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del g
+    return peak
+
+
+def RenderTime(g):
+    # Returns the seconds taken to draw 'g' with DrawGraph on an off-screen Agg canvas.
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+    from render import DrawGraph
+    figure = Figure(figsize=(8, 8), dpi=100)
+    canvas = FigureCanvasAgg(figure)
+    start = time.perf_counter()
+    DrawGraph(figure.add_subplot(111), g)
+    canvas.draw()
+    return time.perf_counter() - start
+
+
+def RunBenchmark(generator, n, seed=0, queries=1000, render=True, memory=True):
+    # Times every operation on one generated graph and returns the list of results.
+    rng = random.Random(seed + 1)
+    nodes, segments = GENERATORS[generator](n, seed)
+    row = dict(generator=generator, size=n, nodes=len(nodes), segments=len(segments))
+    results = []
+
+    g = Graph()
+    Measure(results, row, 'AddNode', len(nodes),
+            lambda: [AddNode(g, Node(name, x, y)) for name, x, y in nodes])
+    Measure(results, row, 'AddSegment', len(segments),
+            lambda: [AddSegment(g, segment_id, origin, destination) for segment_id, origin, destination in segments])
+
+    side = math.sqrt(max(n, 1))
+    points = [(rng.uniform(0, side), rng.uniform(0, side)) for _ in range(queries)]
+    Measure(results, row, 'GetClosest', queries, lambda: [GetClosest(g, x, y) for x, y in points])
+
+    if render:
+        seconds = RenderTime(g)
+        results.append(dict(row, operation='render', count=1, seconds=round(seconds, 6),
+                            per_call_us=round(1e6 * seconds, 3)))
+
+    with tempfile.TemporaryDirectory() as directory:
+        file_path = os.path.join(directory, 'graph.txt')
+        SaveGraphToFile(g, file_path)
+        lines = len(nodes) + len(segments)
+        Measure(results, row, 'LoadGraphFromFile', lines, lambda: LoadGraphFromFile(file_path))
+
+    deleted = rng.sample(segments, min(queries, len(segments)))
+    Measure(results, row, 'DeleteSegment', len(deleted), lambda: [DeleteSegment(g, item[0]) for item in deleted])
+    deleted = rng.sample(nodes, min(queries, len(nodes)))
+    Measure(results, row, 'DeleteNode', len(deleted), lambda: [DeleteNode(g, item[0]) for item in deleted])
+    del g
+
+    if memory:
+        peak = PeakMemory(nodes, segments)
+        results.append(dict(row, operation='memory', peak_bytes=peak,
+                            bytes_per_node=round(peak / max(len(nodes), 1), 1)))
+    return results
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description="Times the graph operations on generated graphs and writes JSON.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000],
+                        help="number of nodes of each graph (1000000 works but takes minutes)")
+    parser.add_argument('--generators', nargs='+', choices=sorted(GENERATORS), default=sorted(GENERATORS))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--queries', type=int, default=1000, help="calls of GetClosest, DeleteSegment and DeleteNode")
+    parser.add_argument('--no-render', action='store_true', help="skip the rendering benchmark")
+    parser.add_argument('--no-memory', action='store_true', help="skip the tracemalloc build")
+    parser.add_argument('--label', default='', help="name of this run, for example the release being measured")
+    parser.add_argument('--output', help="JSON file to write (standard output by default)")
+    options = parser.parse_args(arguments)
+
+    results = []
+    for generator in options.generators:
+        for n in options.sizes:
+            print(f"{generator} {n}...", file=sys.stderr)
+            results.extend(RunBenchmark(generator, n, options.seed, options.queries,
+                                        not options.no_render, not options.no_memory))
+
+    report = {
+        'label': options.label,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'seed': options.seed,
+        'results': results,
+    }
+    if resource is not None:
+        # Peak resident memory of the whole run, in bytes (ru_maxrss is in kilobytes on Linux and bytes on macOS).
+        scale = 1 if sys.platform == 'darwin' else 1024
+        report['max_rss_bytes'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+    text = json.dumps(report, indent=2)
+    if options.output:
+        with open(options.output, 'w') as file:
+            file.write(text + "\n")
+    else:
+        print(text)
+    return report
+
+
+if __name__ == "__main__":
+    main()
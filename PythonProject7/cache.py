@@ -0,0 +1,51 @@
+from collections import OrderedDict
+# `OrderedDict` keeps the entries in the order they were last used, so the least recently used one is dropped first.
+
+
+class QueryCache:
+    # This class represents a bounded least-recently-used cache of query results for one graph.
+    # Every entry belongs to a version of the graph: as soon as the graph reports a newer version the whole cache is
+    # emptied, so a result computed before an edit is never returned after it.
+    def __init__(self, max_entries=1024):
+        # max_entries: number of results kept; 0 disables the cache.
+        # hits and misses count the lookups answered from the cache and the ones that had to be computed.
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def Lookup(self, key, version, compute):
+        # Returns the cached result for 'key' if it was computed at 'version', otherwise calls compute(),
+        # stores its result and returns it. 'key' must be hashable.
+        if version != self.version:
+            self.entries.clear()
+            self.version = version
+        try:
+            value = self.entries[key]
+        except KeyError:
+            self.misses += 1
+            value = compute()
+            if self.max_entries > 0:
+                self.entries[key] = value
+                if len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+            return value
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return value
+
+    def Clear(self):
+        # Drops every entry and resets the counters.
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def GetStats(self):
+        # Returns the counters as a dictionary.
+        total = self.hits + self.misses
+        return {'entries': len(self.entries), 'max_entries': self.max_entries, 'hits': self.hits,
+                'misses': self.misses, 'hit_rate': self.hits / total if total else 0.0}
@@ -0,0 +1,122 @@
+from array import array
+# `array` holds the per-node numbers of the strongly connected components search as compact typed arrays.
+
+
+class ComponentTracker:
+    # This class represents the weakly connected components of a graph as a union-find (disjoint set) structure
+    # over the node names. Segments are treated as undirected: two nodes are in the same component if there is a
+    # path between them ignoring the direction of the segments.
+    # Adding nodes and segments updates it in near-constant time; deletions cannot be undone in a union-find,
+    # so the graph drops its tracker when something is deleted and builds a new one on the next query.
+    def __init__(self):
+        # parent maps each name to another name of its component (itself for the root of the component).
+        # size maps each root to the number of nodes of its component. count is the number of components.
+        self.parent = {}
+        self.size = {}
+        self.count = 0
+
+    def __len__(self):
+        return len(self.parent)
+
+    def Add(self, name):
+        # Adds a node that is not connected to anything yet.
+        if name not in self.parent:
+            self.parent[name] = name
+            self.size[name] = 1
+            self.count += 1
+
+    def Find(self, name):
+        # Returns the root of the component of 'name'. Every visited node is pointed to its grandparent
+        # (path halving), which keeps the trees flat.
+        parent = self.parent
+        while parent[name] != name:
+            parent[name] = parent[parent[name]]
+            name = parent[name]
+        return name
+
+    def Union(self, name1, name2):
+        # Merges the components of 'name1' and 'name2'; the smaller tree goes under the root of the larger one.
+        root1, root2 = self.Find(name1), self.Find(name2)
+        if root1 == root2:
+            return
+        if self.size[root1] < self.size[root2]:
+            root1, root2 = root2, root1
+        self.parent[root2] = root1
+        self.size[root1] += self.size.pop(root2)
+        self.count -= 1
+
+    def Connected(self, name1, name2):
+        return self.Find(name1) == self.Find(name2)
+
+    def ComponentSize(self, name):
+        return self.size[self.Find(name)]
+
+
+def BuildComponentTracker(g):
+    # Builds a ComponentTracker with every node and segment of the graph 'g', in time linear in its size.
+    tracker = ComponentTracker()
+    for name in g.node_index:
+        tracker.Add(name)
+    for s in g.segments:
+        tracker.Union(s.origin.name, s.destination.name)
+    return tracker
+
+
+def StronglyConnectedComponents(s):
+    # Finds the strongly connected components of the GraphSnapshot 's' with Tarjan's algorithm, in time linear in
+    # the number of nodes and segments. Two nodes are in the same component if each one can be reached from the other
+    # following the direction of the segments.
+    # Returns (count, labels): labels[i] is the component of node i, numbered from 0 to count - 1. A component only
+    # reaches components with a smaller number, so the numbers are a reverse topological order of the components.
+    # The depth-first search keeps its own stack, so long chains do not hit the recursion limit.
+    n = len(s)
+    offsets, targets = s.offsets, s.targets
+    order = array('q', [-1]) * n  # Position of each node in the depth-first search, -1 until it is visited.
+    low = array('q', bytes(8 * n))  # Smallest position reachable from the subtree of each node.
+    labels = array('q', [-1]) * n
+    on_stack = bytearray(n)
+    stack = []  # Visited nodes whose component is not known yet.
+    counter = 0
+    count = 0
+    for root in range(n):
+        if order[root] != -1:
+            continue
+        order[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = 1
+        work = [(root, offsets[root])]  # (node, position of its next segment to follow)
+        while work:
+            v, e = work[-1]
+            end = offsets[v + 1]
+            while e < end:
+                w = targets[e]
+                e += 1
+                if order[w] == -1:
+                    # Descends into w; v is resumed from its next segment afterwards.
+                    work[-1] = (v, e)
+                    order[w] = low[w] = counter
+                    counter += 1
+                    stack.append(w)
+                    on_stack[w] = 1
+                    work.append((w, offsets[w]))
+                    break
+                if on_stack[w] and order[w] < low[v]:
+                    low[v] = order[w]
+            else:
+                # Every segment of v has been followed.
+                work.pop()
+                if low[v] == order[v]:
+                    # v is the first node visited in its component, which is everything above it on the stack.
+                    while True:
+                        w = stack.pop()
+                        on_stack[w] = 0
+                        labels[w] = count
+                        if w == v:
+                            break
+                    count += 1
+                if work:
+                    u = work[-1][0]
+                    if low[v] < low[u]:
+                        low[u] = low[v]
+    return count, labels
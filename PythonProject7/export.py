@@ -0,0 +1,173 @@
+import multiprocessing
+import os
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from graph_binary import GraphFromSnapshot
+from instrument import Instrumented
+from render import DrawGraph, SegmentArrays, VisibleMask
+from snapshot import GraphSnapshot, SnapshotArrays
+# `Figure` and `FigureCanvasAgg` draw off-screen with the Agg backend. pyplot is never imported here, so rendering
+# works on machines without a display and never opens a window or loads a GUI toolkit.
+# `multiprocessing` renders batches in worker processes; every group of images carries its graph as snapshot arrays,
+# which the worker rebuilds with `GraphFromSnapshot` in the original segment order.
+# `DrawGraph` draws a whole graph with a few matplotlib collections; `SegmentArrays` and `VisibleMask` find the
+# segments inside a viewport so the ones outside are not drawn at all.
+
+
+class GraphRenderer:
+    # This class renders graphs to image files on one off-screen figure, which is cleared and resized for every
+    # image instead of being created again.
+    def __init__(self):
+        self.figure = Figure()
+        self.canvas = FigureCanvasAgg(self.figure)
+        self.ax = self.figure.add_subplot(111)
+        # (graph, version, segments, their coordinate array) of the last graph rendered with a viewport, so several
+        # views of the same graph only gather the coordinates once.
+        self.segment_cache = None
+
+    def SegmentsInside(self, g, segments, viewport):
+        # Returns the segments of 'segments' (all the segments of 'g' if None) whose bounding box meets 'viewport'.
+        if segments is None:
+            cache = self.segment_cache
+            if cache is None or cache[0] is not g or cache[1] != g.version:
+                segments = list(g.segments)
+                cache = self.segment_cache = (g, g.version, segments, SegmentArrays(segments))
+            segments, points = cache[2], cache[3]
+        else:
+            points = SegmentArrays(segments)
+        if not len(segments):
+            return segments
+        inside = VisibleMask(points, viewport[:2], viewport[2:])
+        return [segments[i] for i in inside.nonzero()[0]]
+
+    def Render(self, g, file_path, node_name=None, width=800, height=600, viewport=None, dpi=100, file_format=None):
+        # Draws the graph 'g' (or, with 'node_name', every node plus the segments between that node and its
+        # neighbors, like PlotNode) and saves it to 'file_path'.
+        # width and height: size of the image in pixels at 'dpi' dots per inch.
+        # viewport: (x_min, x_max, y_min, y_max) of the area shown; by default the whole graph.
+        # file_format: 'png' or 'svg' (anything matplotlib can save); by default taken from the file extension.
+        # Returns True if the image was written, False if the node does not exist or the file cannot be written.
+        segments = None
+        title = "Graph with Direction Indicated at Segment End"
+        if node_name is not None:
+            if g.GetNodeByName(node_name) is None:
+                print(f"Node '{node_name}' does not exist in the graph.")
+                return False
+            segments = g.GetNeighborSegments(node_name)
+            title = f"Graph with nodes and segments for node '{node_name}'"
+
+        self.figure.set_size_inches(width / dpi, height / dpi)
+        self.figure.set_dpi(dpi)
+        ax = self.ax
+        ax.clear()
+        if viewport is not None:
+            # Fixed limits are kept by DrawGraph, which then only labels what is inside them.
+            ax.set_xlim(viewport[0], viewport[1])
+            ax.set_ylim(viewport[2], viewport[3])
+            segments = self.SegmentsInside(g, segments, viewport)
+        DrawGraph(ax, g, segments)
+        ax.set_xlabel('X')
+        ax.set_ylabel('Y')
+        ax.set_title(title)
+        ax.grid(True)
+        try:
+            self.figure.savefig(file_path, dpi=dpi, format=file_format)
+        except (OSError, ValueError) as e:
+            print(f"Error saving image: {e}")
+            return False
+        return True
+
+
+class RenderJob:
+    # This class describes one image of a RenderBatch call: the Graph, the file and the options of
+    # GraphRenderer.Render.
+    def __init__(self, g, file_path, node_name=None, width=800, height=600, viewport=None, dpi=100,
+                 file_format=None):
+        self.g = g
+        self.file_path = file_path
+        self.node_name = node_name
+        self.width = width
+        self.height = height
+        self.viewport = viewport
+        self.dpi = dpi
+        self.file_format = file_format
+
+    def Options(self):
+        # Returns the arguments of GraphRenderer.Render after the graph, as a picklable tuple.
+        return (self.file_path, self.node_name, self.width, self.height, self.viewport, self.dpi, self.file_format)
+
+
+# Renderer shared by RenderGraph, RenderNode and the batches of one process, created by the first image.
+renderer = None
+
+
+def GetRenderer():
+    global renderer
+    if renderer is None:
+        renderer = GraphRenderer()
+    return renderer
+
+
+@Instrumented
+def RenderGraph(g, file_path, width=800, height=600, viewport=None, dpi=100, file_format=None):
+    # Saves an image of the whole graph 'g' to 'file_path' without opening a window (see GraphRenderer.Render).
+    # Returns True if the image was written, False otherwise.
+    return GetRenderer().Render(g, file_path, None, width, height, viewport, dpi, file_format)
+
+
+@Instrumented
+def RenderNode(g, name, file_path, width=800, height=600, viewport=None, dpi=100, file_format=None):
+    # Saves an image of the node called 'name' and its neighbors to 'file_path', like PlotNode without a window.
+    return GetRenderer().Render(g, file_path, name, width, height, viewport, dpi, file_format)
+
+
+# (position in the batch, Graph) of the last graph rebuilt by this worker process. Only one is kept, so a worker
+# never holds more than one graph of a batch.
+worker_graph = None
+
+
+def RenderGroup(task):
+    # Runs in a worker process: renders some images of one graph, rebuilding the graph from its snapshot arrays
+    # unless the previous group of this worker was of the same graph.
+    global worker_graph
+    index, arrays, options = task
+    if worker_graph is None or worker_graph[0] != index:
+        worker_graph = None  # The previous graph is released before the next one is built.
+        worker_graph = (index, GraphFromSnapshot(GraphSnapshot(*arrays)))
+    return [GetRenderer().Render(worker_graph[1], *item) for item in options]
+
+
+@Instrumented
+def RenderBatch(jobs, processes=None):
+    # Renders every RenderJob of 'jobs' and returns a list with True or False for each of them, in order.
+    # The images are shared among 'processes' worker processes (one per CPU by default). Each graph is frozen once
+    # and its images split in at most one group per worker; a group carries the graph with it, so a graph is only
+    # sent to the workers that render some of its images, and a worker keeps one graph at a time. Each worker draws
+    # all its images on a single figure, and the images are the same as the ones rendered without processes.
+    # Scripts using several processes need an 'if __name__ == "__main__":' guard on platforms that start workers
+    # by importing the main module (Windows, macOS).
+    jobs = list(jobs)
+    if processes is None:
+        processes = os.cpu_count() or 1
+    processes = min(processes, len(jobs))
+    if processes <= 1:
+        # Not worth starting processes: the images are rendered here, one after another.
+        return [GetRenderer().Render(job.g, *job.Options()) for job in jobs]
+
+    graphs = {}  # id of each graph -> positions of its jobs, in the order the graphs first appear.
+    for position, job in enumerate(jobs):
+        graphs.setdefault(id(job.g), []).append(position)
+    tasks, positions = [], []
+    for index, members in enumerate(graphs.values()):
+        arrays = SnapshotArrays(jobs[members[0]].g.Freeze())
+        groups = min(processes, len(members))
+        for k in range(groups):
+            group = members[k::groups]
+            tasks.append((index, arrays, [jobs[position].Options() for position in group]))
+            positions.append(group)
+    results = [False] * len(jobs)
+    with multiprocessing.Pool(processes) as pool:
+        for group, written in zip(positions, pool.map(RenderGroup, tasks, 1)):
+            for position, ok in zip(group, written):
+                results[position] = ok
+    return results
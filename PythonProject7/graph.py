@@ -1,238 +1,590 @@
-from matplotlib import patches
-from node import Node
-from segment import Segment
-import matplotlib.pyplot as plt
+import contextlib
+import gc
+import time
+from node import Node, LinkNeighbor, UnlinkNeighbor
+from segment import Segment, BuildSegments, ComputeCosts
+from spatial import SpatialGrid, SegmentGrid
+from snapshot import BuildSnapshot
+from instrument import Instrumented, Scanned
+from cache import QueryCache
+from connectivity import BuildComponentTracker, StronglyConnectedComponents
 # Importing required libraries and classes.
-# `matplotlib` is used for graphical plotting.
+# The plotting functions live in plotting.py and only import matplotlib when they are called.
 # `Node` and `Segment` classes are imported from their respective modules for graph representation.
+# `SpatialGrid` indexes the nodes by position for the closest-node queries, `SegmentGrid` the segments.
+# `BuildSnapshot` freezes the graph into flat arrays for read-heavy work.
+# `gc` is paused while the bulk functions create millions of objects.
+# `Instrumented` records the calls of the public operations while instrumentation is enabled (see instrument.py).
+# The constant-time Graph getters are left out: the check would cost as much as the lookup itself.
+# `QueryCache` remembers query results until the graph changes.
+# `BuildComponentTracker` and `StronglyConnectedComponents` answer the connectivity queries (see connectivity.py).
 
 
 class Graph:
    # This class represents a graph, consisting of nodes and segments connecting them.
    def __init__(self):
-       # Initializes the graph with empty lists for nodes and segments.
-       self.nodes = []
-       self.segments = []
+       # Initializes the graph with empty indexes for nodes and segments.
+       # node_index maps each node name to its Node and segment_index maps each segment id to its Segment,
+       # so lookups, inserts and deletes by name or id take constant time on average.
+       self.node_index = {}
+       self.segment_index = {}
+       self.spatial = SpatialGrid()  # Grid over the node coordinates, kept up to date by AddNode and DeleteNode.
+       # SegmentGrid over the segment bounding boxes. Like 'components' it is built by the first segment query, then
+       # kept up to date by the functions that add and delete segments.
+       self.segment_spatial = None
+       # Map each node name to the segments that start (outgoing) or end (incoming) at that node, as a dict from
+       # segment id to Segment: it keeps the order in which they were added and removes one in constant time.
+       self.outgoing = {}
+       self.incoming = {}
+       # Number of changes made to the graph so far. Every function that adds, deletes or moves something increases
+       # it, so a result computed at one version is known to be out of date at any later one.
+       self.version = 0
+       self.cache = QueryCache()  # Results of closest-node, neighbor and route queries, valid for one version.
+       # ComponentTracker of the weakly connected components. It is built by the first connectivity query, kept up to
+       # date by the functions that add nodes and segments, and dropped (None) by the ones that delete them.
+       self.components = None
+       # ContractionHierarchy attached by PrepareHierarchy (see hierarchy.py). FindPath uses it while it is not stale.
+       self.hierarchy = None
+
+   @property
+   def nodes(self):
+       # Live view over the nodes of the graph, in insertion order.
+       return self.node_index.values()
+
+   @property
+   def segments(self):
+       # Live view over the segments of the graph, in insertion order.
+       return self.segment_index.values()
 
    def GetNodeByName(self, name):
-       for node in self.nodes:
-           if node.name == name:
-               return node
-       return None
-
-
+       return self.node_index.get(name)
+
+   def GetSegmentById(self, segment_id):
+       return self.segment_index.get(segment_id)
+
+   def GetOutgoingSegments(self, name):
+       # Returns the segments that start at the node called 'name' (empty for unknown nodes).
+       return self.outgoing.get(name, {}).values()
+
+   def GetIncomingSegments(self, name):
+       # Returns the segments that end at the node called 'name' (empty for unknown nodes).
+       return self.incoming.get(name, {}).values()
+
+   @Instrumented
+   def GetTouchingSegments(self, name):
+       # Returns every segment that starts or ends at the node called 'name', each one once.
+       # Takes time proportional to the degree of the node.
+       outgoing = list(self.GetOutgoingSegments(name))
+       return outgoing + [s for s in self.GetIncomingSegments(name) if s.origin.name != name]
+
+   @Instrumented
+   def GetNeighborSegments(self, name):
+       # Returns the segments between the node called 'name' and its neighbors in either direction:
+       # the segments leaving the node plus the ones coming back from a node it points to.
+       return list(self.cache.Lookup(('neighbors', name), self.version, lambda: self.FindNeighborSegments(name)))
+
+   def FindNeighborSegments(self, name):
+       node = self.node_index.get(name)
+       if node is None:
+           return []
+       back = [s for s in self.incoming[name].values() if s.origin is not node and s.origin in node.neighbors]
+       return list(self.outgoing[name].values()) + back
+
+   def OutDegree(self, name):
+       # Returns the number of segments that start at the node called 'name' (0 for unknown nodes).
+       return len(self.outgoing.get(name, ()))
+
+   def InDegree(self, name):
+       # Returns the number of segments that end at the node called 'name' (0 for unknown nodes).
+       return len(self.incoming.get(name, ()))
+
+   @Instrumented
+   def GetPredecessors(self, name):
+       # Returns the nodes with at least one segment towards the node called 'name', in the order those
+       # segments were added and without repetitions.
+       return list(dict.fromkeys(s.origin for s in self.GetIncomingSegments(name)))
+
+   def GetCacheStats(self):
+       # Returns the hits, misses and size of the query cache.
+       return self.cache.GetStats()
+
+   @Instrumented
+   def Freeze(self):
+       # Returns an immutable compressed-sparse-row snapshot of the graph (see snapshot.py).
+       # Later changes to the graph are not reflected in the snapshot.
+       return BuildSnapshot(self)
+
+
+@Instrumented
 def AddNode(g, n):
    # Adds a node 'n' to the graph 'g'.
-   # If the node already exists in the graph, returns False. Otherwise, adds the node and returns True.
-   if n in g.nodes:
+   # If a node with the same name already exists in the graph, returns False. Otherwise, adds the node and returns True.
+   if n.name in g.node_index:
        return False
    else:
-       g.nodes.append(n)
+       g.node_index[n.name] = n
+       g.outgoing[n.name] = {}
+       g.incoming[n.name] = {}
+       g.spatial.Insert(n)
+       if g.components is not None:
+           g.components.Add(n.name)
+       g.version += 1
        return True
 
 
+@Instrumented
 def AddSegment(g, segment_id, name1, name2):
    # Adds a segment to the graph 'g' by connecting nodes with names 'name1' and 'name2'.
-   # Also updates the neighbors list of the origin node.
-   n1 = n2 = None
-   for n in g.nodes:
-       if n.name == name1:
-           n1 = n  # Finds the origin node.
-       if n.name == name2:
-           n2 = n  # Finds the destination node.
+   # Also updates the neighbors of the origin node.
+   # Returns False if the segment id is already used or either node is not found in the graph.
+   if segment_id in g.segment_index:
+       return False
+   n1 = g.node_index.get(name1)  # Finds the origin node.
+   n2 = g.node_index.get(name2)  # Finds the destination node.
 
 
    if n1 is None or n2 is None:
        # Returns False if either node is not found in the graph.
        return False
    else:
-       s = Segment(n1, n2)  # Creates the segment using the origin and destination nodes.
-       s.id = segment_id  # Assigns an ID to the segment.
-       g.segments.append(s)  # Adds the segment to the graph.
-       n1.neighbors.append(n2)  # Updates the neighbor list of the origin node.
+       s = Segment(n1, n2, segment_id=segment_id)  # Creates the segment using the origin and destination nodes.
+       g.segment_index[segment_id] = s  # Adds the segment to the graph.
+       g.outgoing[name1][segment_id] = s
+       g.incoming[name2][segment_id] = s
+       LinkNeighbor(n1, n2)  # Updates the neighbors of the origin node.
+       if g.components is not None:
+           g.components.Union(name1, name2)
+       if g.segment_spatial is not None:
+           g.segment_spatial.Insert(s)
+       g.version += 1
        return True
+
+
+@Instrumented
+def AddSegmentsFromArrays(g, segment_ids, origin_names, destination_names):
+   # Adds many segments at once: segment i goes from origin_names[i] to destination_names[i] with id segment_ids[i].
+   # Every pair is checked like in AddSegment, then the costs of all the valid segments are computed in one
+   # vectorized operation (see BuildSegments). Returns the positions of the items that were rejected.
+   rejected = []
+   ids, origins, destinations = [], [], []
+   seen = set()
+   for i, (segment_id, name1, name2) in enumerate(zip(segment_ids, origin_names, destination_names)):
+       n1 = g.node_index.get(name1)
+       n2 = g.node_index.get(name2)
+       if n1 is None or n2 is None or segment_id in g.segment_index or segment_id in seen:
+           rejected.append(i)
+       else:
+           seen.add(segment_id)
+           ids.append(segment_id)
+           origins.append(n1)
+           destinations.append(n2)
+   Scanned(len(ids) + len(rejected))
+   with GarbageCollectionPaused():
+       InsertSegments(g, BuildSegments(origins, destinations, ids), [n.name for n in origins],
+                      [n.name for n in destinations])
+   return rejected
+
+
+def InsertSegments(g, segments, origin_names, destination_names):
+   # Puts already built and validated segments into the indexes of 'g' and updates the neighbors of their origins.
+   # origin_names[i] and destination_names[i] are the names of the nodes of segments[i].
+   g.segment_index.update((s.id, s) for s in segments)
+   for s, outgoing, incoming in zip(segments, map(g.outgoing.__getitem__, origin_names),
+                                    map(g.incoming.__getitem__, destination_names)):
+       outgoing[s.id] = incoming[s.id] = s
+   for s in segments:
+       neighbors, destination = s.origin.neighbors, s.destination
+       neighbors[destination] = neighbors.get(destination, 0) + 1  # Same as LinkNeighbor, without the call.
+   if g.components is not None:
+       for name1, name2 in zip(origin_names, destination_names):
+           g.components.Union(name1, name2)
+   if g.segment_spatial is not None:
+       for s in segments:
+           g.segment_spatial.Insert(s)
+   if segments:
+       g.version += 1
+
+
+@contextlib.contextmanager
+def GarbageCollectionPaused():
+   # Turns the cyclic garbage collector off inside a 'with' block. Creating millions of nodes and segments would
+   # otherwise start a collection every few hundred objects, each one walking every object created so far.
+   # Nothing created by the bulk functions is garbage, so pausing it only skips wasted work.
+   was_enabled = gc.isenabled()
+   gc.disable()
+   try:
+       yield
+   finally:
+       if was_enabled:
+           gc.enable()
+
+
+@Instrumented
+def AddNodes(g, nodes):
+   # Adds many nodes to the graph 'g' at once. The batch is atomic: if any name is already in the graph or appears
+   # twice in 'nodes', nothing is added and False is returned; otherwise every node is added and True is returned.
+   # The spatial index is rebuilt once at the end instead of being updated node by node.
+   nodes = list(nodes)
+   names = [n.name for n in nodes]
+   unique = set(names)
+   if len(unique) != len(names) or not unique.isdisjoint(g.node_index):
+       return False
+   with GarbageCollectionPaused():
+       g.node_index.update(zip(names, nodes))
+       g.outgoing.update((name, {}) for name in names)
+       g.incoming.update((name, {}) for name in names)
+       g.spatial.InsertMany(nodes)
+       if g.components is not None:
+           for name in names:
+               g.components.Add(name)
+   if nodes:
+       g.version += 1
+   Scanned(len(nodes))
+   return True
+
+
+@Instrumented
+def AddSegments(g, segment_ids, origin_names, destination_names):
+   # Adds many segments to the graph 'g' at once: segment i goes from origin_names[i] to destination_names[i] and has
+   # the id segment_ids[i] (any iterables or arrays of the same length). The batch is atomic: if any id is already
+   # used or repeated, or any node is unknown, nothing is added and False is returned; otherwise returns True.
+   # Everything is checked in one pass over the batch and the costs are computed together (see BuildSegments).
+   segment_ids, origin_names, destination_names = list(segment_ids), list(origin_names), list(destination_names)
+   if not len(segment_ids) == len(origin_names) == len(destination_names):
+       return False
+   unique = set(segment_ids)
+   if len(unique) != len(segment_ids) or not unique.isdisjoint(g.segment_index):
+       return False
+   origins = list(map(g.node_index.get, origin_names))
+   destinations = list(map(g.node_index.get, destination_names))
+   if None in origins or None in destinations:
+       return False
+   with GarbageCollectionPaused():
+       InsertSegments(g, BuildSegments(origins, destinations, segment_ids), origin_names, destination_names)
+   Scanned(len(segment_ids))
+   return True
+
+
+@Instrumented
+def RecomputeCosts(g):
+   # Recomputes the cost of every segment of 'g' from the current node coordinates, in one vectorized
+   # operation, and refreshes the spatial index. Call it after moving or rescaling nodes.
+   segments = list(g.segments)
+   origins = [s.origin for s in segments]
+   destinations = [s.destination for s in segments]
+   costs = ComputeCosts([n.x for n in origins], [n.y for n in origins],
+                        [n.x for n in destinations], [n.y for n in destinations])
+   for s, cost in zip(segments, costs):
+       s.cost = cost
+   g.spatial.Rebuild()
+   if g.segment_spatial is not None:
+       g.segment_spatial.Rebuild()
+   g.version += 1
+   Scanned(len(segments))
+
+
+@Instrumented
 def DeleteNode(g, name):
-    node_to_remove = g.GetNodeByName(name)
+    node_to_remove = g.node_index.pop(name, None)
     if node_to_remove is None:
         return False
+    g.spatial.Remove(node_to_remove)
+    g.components = None  # Se reconstruye en la siguiente consulta de conectividad
+    g.version += 1
+    Scanned(len(g.outgoing[name]) + len(g.incoming[name]))
+
+    # Eliminar los segmentos que salen de este nodo; solo se recorren los segmentos del propio nodo
+    for segment in g.outgoing.pop(name).values():
+        del g.segment_index[segment.id]
+        if g.segment_spatial is not None:
+            g.segment_spatial.Remove(segment)
+        if segment.destination is not node_to_remove:
+            del g.incoming[segment.destination.name][segment.id]
+
+    # Eliminar los segmentos que llegan a este nodo y quitarlo de los vecinos de sus predecesores
+    for segment in g.incoming.pop(name).values():
+        if segment.origin is not node_to_remove:
+            del g.segment_index[segment.id]
+            if g.segment_spatial is not None:
+                g.segment_spatial.Remove(segment)
+            del g.outgoing[segment.origin.name][segment.id]
+            segment.origin.neighbors.pop(node_to_remove, None)
 
-    # Eliminar todos los segmentos conectados a este nodo
-    g.segments = [s for s in g.segments if s.origin != node_to_remove and s.destination != node_to_remove]
-
-    # Eliminar este nodo de la lista de vecinos de otros nodos
-    for node in g.nodes:
-        if node_to_remove in node.neighbors:
-            node.neighbors.remove(node_to_remove)
+    return True
 
-    # Eliminar el nodo de la lista de nodos del grafo
-    g.nodes.remove(node_to_remove)
 
-    return True
+@Instrumented
 def DeleteSegment(g, segment_id):
-    for segment in g.segments:
-        if segment.id == segment_id:
-            segment.origin.neighbors.remove(segment.destination)
-            g.segments.remove(segment)
-            return True
-    return False
+    segment_to_delete = g.segment_index.pop(segment_id, None)
+    if segment_to_delete is None:
+        return False
+    g.components = None
+    g.version += 1
+    del g.outgoing[segment_to_delete.origin.name][segment_id]
+    del g.incoming[segment_to_delete.destination.name][segment_id]
+    if g.segment_spatial is not None:
+        g.segment_spatial.Remove(segment_to_delete)
+
+    # También quitamos al destino como vecino del origen si no le queda otro segmento hacia él
+    UnlinkNeighbor(segment_to_delete.origin, segment_to_delete.destination)
+    return True
 
 
+@Instrumented
 def GetClosest(g, x, y):
    # Finds and returns the node closest to the given coordinates (x, y) in the graph 'g'.
-   if not g.nodes:
-       return None  # Returns None if the graph has no nodes.
-
-
-   closest_node = None
-   min_distance = float('inf')  # Initializes the minimum distance to infinity.
+   # Returns None if the graph has no nodes. The spatial index only visits the cells around (x, y).
+   # Repeated queries are answered from the cache of 'g' until the graph changes.
+   return g.cache.Lookup(('closest', x, y), g.version, lambda: g.spatial.Nearest(x, y))
 
 
-   for node in g.nodes:
-       # Calculates the Euclidean distance between the given point and each node.
-       distance = ((node.x - x) ** 2 + (node.y - y) ** 2) ** 0.5
+@Instrumented
+def GetKClosest(g, x, y, k):
+   # Returns up to 'k' nodes of the graph 'g' ordered from the closest to the farthest from (x, y).
+   return list(g.cache.Lookup(('k-closest', x, y, k), g.version, lambda: g.spatial.KNearest(x, y, k)))
 
 
-       if distance < min_distance:
-           min_distance = distance
-           closest_node = node  # Updates the closest node if a shorter distance is found.
+@Instrumented
+def GetNodesInRadius(g, x, y, radius):
+   # Returns every node of the graph 'g' within distance 'radius' of (x, y), ordered by distance.
+   return list(g.cache.Lookup(('radius', x, y, radius), g.version, lambda: g.spatial.WithinRadius(x, y, radius)))
 
 
-   return closest_node
+@Instrumented
+def GetNodesInRectangle(g, x_min, y_min, x_max, y_max):
+   # Returns the nodes of 'g' inside the rectangle from (x_min, y_min) to (x_max, y_max), borders included.
+   return g.spatial.InRectangle(min(x_min, x_max), min(y_min, y_max), max(x_min, x_max), max(y_min, y_max))
 
 
-def Plot(g):
-   # Plots the entire graph, including nodes, segments, and costs of the segments.
-   for segment in g.segments:
-       # Draws each segment as a line connecting the origin and destination nodes.
-       plt.plot([segment.origin.x, segment.destination.x],
-                [segment.origin.y, segment.destination.y], 'blue')
+def GetSegmentGrid(g):
+   # Returns the SegmentGrid of 'g', building it first if the graph has none yet.
+   if g.segment_spatial is None:
+       g.segment_spatial = SegmentGrid()
+       g.segment_spatial.InsertMany(g.segments)
+       Scanned(len(g.segment_index))
+   return g.segment_spatial
 
 
-       # Calculates the midpoint of the segment to display its cost.
-       midpoint_x = segment.origin.x + (segment.destination.x - segment.origin.x) / 2
-       midpoint_y = segment.origin.y + (segment.destination.y - segment.origin.y) / 2
-       plt.text(midpoint_x, midpoint_y, round(segment.cost, 2))  # Displays the segment cost.
+@Instrumented
+def GetClosestSegment(g, x, y):
+   # Returns the segment of 'g' closest to the point (x, y), measured to the closest point of the segment,
+   # or None if the graph has no segments. Only the cells around (x, y) are visited.
+   return g.cache.Lookup(('closest-segment', x, y), g.version, lambda: GetSegmentGrid(g).Nearest(x, y))
 
 
-       # Adds an arrow to indicate the direction of the segment.
-       plt.arrow(segment.origin.x, segment.origin.y,
-                 segment.destination.x - segment.origin.x,
-                 segment.destination.y - segment.origin.y,
-                 head_width=0.5, head_length=0.5, fc='blue', ec='blue', length_includes_head=True)
+@Instrumented
+def GetSegmentsInRectangle(g, x_min, y_min, x_max, y_max):
+   # Returns the segments of 'g' that cross or touch the rectangle from (x_min, y_min) to (x_max, y_max),
+   # not only the ones whose bounding box overlaps it. The corners can be given in any order.
+   x_min, x_max = min(x_min, x_max), max(x_min, x_max)
+   y_min, y_max = min(y_min, y_max), max(y_min, y_max)
+   return GetSegmentGrid(g).InRectangle(x_min, y_min, x_max, y_max)
 
 
-   # Draws all the nodes in the graph.
-   for node in g.nodes:
-       plt.plot(node.x, node.y, marker='o', linestyle='', color='black', markersize=5)
-       plt.text(node.x, node.y, node.name, horizontalalignment='left', verticalalignment='bottom', color='red',
-                fontsize=7)
+def GetComponents(g):
+   # Returns the ComponentTracker of 'g', building it first if the graph has none (new graph or after a deletion).
+   if g.components is None:
+       g.components = BuildComponentTracker(g)
+       Scanned(len(g.node_index) + len(g.segment_index))
+   return g.components
 
 
-   # Adds labels, title, and grid to the plot.
-   plt.xlabel('X')
-   plt.ylabel('Y')
-   plt.title("Graph with Direction Indicated at Segment End")
-   plt.grid()
-   plt.show()
+@Instrumented
+def AreConnected(g, name1, name2):
+   # Returns True if the nodes called 'name1' and 'name2' are in the same weakly connected component of 'g', that is,
+   # if one can be reached from the other ignoring the direction of the segments. Returns False if either is unknown.
+   # Takes near-constant time, except for the first query after a deletion, which rebuilds the components.
+   if name1 not in g.node_index or name2 not in g.node_index:
+       return False
+   return GetComponents(g).Connected(name1, name2)
 
 
-def PlotNode(g, name):
-   # Plots a single node and its neighbors.
-   target_node = None
-   for node in g.nodes:
-       if node.name == name:
-           target_node = node  # Finds the target node by name.
-           break
+@Instrumented
+def CountComponents(g):
+   # Returns the number of weakly connected components of 'g' (each isolated node is one).
+   return GetComponents(g).count
 
 
-   if target_node is None:
-       # If the node doesn't exist, displays a message and returns.
-       print(f"Node '{name}' does not exist in the graph.")
-       return
+@Instrumented
+def GetStronglyConnectedComponents(g):
+   # Returns the strongly connected components of 'g' as lists of node names: two nodes are in the same list if each
+   # one can be reached from the other following the segments. Runs in linear time over a snapshot of the graph
+   # (see StronglyConnectedComponents); a component only reaches components that come before it in the result.
+   return [list(names) for names in g.cache.Lookup(('scc',), g.version, lambda: FindStronglyConnected(g))]
 
 
-   # Creates a new plot for the target node and its neighbors.
-   plt.figure()
-   for node in g.nodes:
-       plt.plot(node.x, node.y, marker='o', linestyle='', color='black', markersize=5)
-       plt.text(node.x, node.y, node.name, horizontalalignment='left', verticalalignment='bottom', color='red')
+def FindStronglyConnected(g):
+   s = g.Freeze()
+   count, labels = StronglyConnectedComponents(s)
+   components = [[] for _ in range(count)]
+   for i, label in enumerate(labels):
+       components[label].append(s.names[i])
+   Scanned(len(s) + len(s.targets))
+   return tuple(tuple(names) for names in components)
 
 
-   for neighbor in target_node.neighbors:
-       for segment in g.segments:
-           if (segment.origin == target_node and segment.destination == neighbor) or \
-                   (segment.origin == neighbor and segment.destination == target_node):
-               # Draws the segment connecting the target node and its neighbor in blue.
-               plt.plot([segment.origin.x, segment.destination.x],
-                        [segment.origin.y, segment.destination.y], 'blue')
-               plt.arrow(segment.origin.x, segment.origin.y,
-                         segment.destination.x - segment.origin.x,
-                         segment.destination.y - segment.origin.y,
-                         head_width=0.5, head_length=0.5, fc='blue', ec='blue', length_includes_head=True)
+def Plot(g, batched=False):
+   # Plots the entire graph (see plotting.py). matplotlib is only imported by the first plot.
+   from plotting import Plot as PlotGraph
+   PlotGraph(g, batched)
 
 
-               # Displays the segment cost at the midpoint.
-               midpoint_x = (segment.origin.x + segment.destination.x) / 2
-               midpoint_y = (segment.origin.y + segment.destination.y) / 2
-               plt.text(midpoint_x, midpoint_y, round(segment.cost, 2))
+def PlotSegmentsOneByOne(g):
+   # Draws every segment, arrow, cost, node and name of 'g' as separate matplotlib artists (see plotting.py).
+   from plotting import PlotSegmentsOneByOne as DrawSegments
+   DrawSegments(g)
 
 
-   # Adds labels, title, and grid to the plot.
-   plt.xlabel('X')
-   plt.ylabel('Y')
-   plt.title(f"Graph with nodes and segments for node '{name}'")
-   plt.grid()
-   plt.show()
+def PlotNode(g, name):
+   # Plots a single node and its neighbors (see plotting.py).
+   from plotting import PlotNode as PlotGraphNode
+   PlotGraphNode(g, name)
 
 
-def LoadGraphFromFile(file_path):
-   # Loads a graph from a text file with nodes and segments data.
+class LoadReport:
+   # This class summarizes a call to StreamGraphFromFile.
+   def __init__(self):
+       # lines: number of lines read. nodes, segments: number of items added to the graph.
+       # errors: (line number, line, reason) for the first malformed lines; error_count counts all of them.
+       self.lines = 0
+       self.nodes = 0
+       self.segments = 0
+       self.errors = []
+       self.error_count = 0
+       # Errors of the chunk being read. Insertion errors are only found when a batch is inserted, after the parse
+       # errors of later lines, so they are put in line order by Flush before the limit is applied.
+       self.pending = []
+       self.elapsed = 0.0
+       self.cancelled = False  # True if the progress callback stopped the load before the end of the file.
+
+   def AddError(self, line_number, line, reason, max_errors):
+       # Records a malformed line. Only the first 'max_errors' lines of the file are kept so memory does not grow
+       # with the file: when the pending errors grow too much, only the earliest ones that can still be kept stay.
+       self.error_count += 1
+       self.pending.append((line_number, line, reason))
+       if len(self.pending) > 2 * max_errors:
+           self.pending.sort(key=lambda error: error[0])
+           del self.pending[max(0, max_errors - len(self.errors)):]
+
+   def Flush(self, max_errors):
+       # Moves the pending errors to 'errors' in line order, up to 'max_errors' errors in total. Every error of a
+       # later chunk comes from a later line, so 'errors' always holds the first errors of the file.
+       self.pending.sort(key=lambda error: error[0])
+       self.errors.extend(self.pending[:max(0, max_errors - len(self.errors))])
+       self.pending = []
+
+
+def InsertParsed(g, report, nodes, segments, max_errors):
+   # Inserts a batch of parsed nodes and segments into 'g' in file order and empties both lists.
+   # Items rejected by AddNode or AddSegment are recorded in the report with their whole line.
+   for number, line, n in nodes:
+       if AddNode(g, n):
+           report.nodes += 1
+       else:
+           report.AddError(number, line, "duplicate node name", max_errors)
+   rejected = AddSegmentsFromArrays(g, [item[2] for item in segments], [item[3] for item in segments],
+                                    [item[4] for item in segments])
+   report.segments += len(segments) - len(rejected)
+   for i in rejected:
+       number, line, segment_id, origin_name, destination_name = segments[i]
+       if origin_name in g.node_index and destination_name in g.node_index:
+           report.AddError(number, line, "duplicate segment id", max_errors)
+       else:
+           report.AddError(number, line, "unknown origin or destination node", max_errors)
+   nodes.clear()
+   segments.clear()
+
+
+@Instrumented
+def StreamGraphFromFile(file_path, chunk_size=1 << 20, progress=None, max_errors=1000):
+   # Loads a graph from a text file in the "Nodes:" / "Segments:" format, reading it in chunks of about
+   # 'chunk_size' bytes so only one chunk of text is held in memory at a time.
+   # Malformed lines are recorded in the report with their line number and skipped instead of aborting the load.
+   # 'progress', if given, is called after each chunk with the report and the number of bytes read so far;
+   # if it returns False the load stops there, report.cancelled is set and the partial graph is returned.
+   # Returns the graph and a LoadReport. Raises OSError if the file cannot be opened.
+   start = time.perf_counter()
    g = Graph()
-   try:
-       with open(file_path, 'r') as file:
-           mode = None  # Determines whether nodes or segments are being read.
-           for line in file:
+   report = LoadReport()
+   mode = None  # Determines whether nodes or segments are being read.
+   line_number = 0
+   nodes = []  # (line number, line, Node) parsed and not inserted yet.
+   segments = []  # (line number, line, id, origin name, destination name) parsed and not inserted yet.
+   with open(file_path, 'r', buffering=chunk_size) as file:
+       while True:
+           chunk = file.readlines(chunk_size)
+           if not chunk:
+               break
+           for line in chunk:
+               line_number += 1
                line = line.strip()
                if not line:
                    continue
-               if line.startswith("Nodes:"):
-                   mode = "nodes"  # Indicates the nodes section is being processed.
+               if line.startswith("Nodes:") or line.startswith("Segments:"):
+                   # Items of the previous section are inserted before a new section starts.
+                   InsertParsed(g, report, nodes, segments, max_errors)
+                   mode = "nodes" if line.startswith("Nodes:") else "segments"
                    continue
-               elif line.startswith("Segments:"):
-                   mode = "segments"  # Indicates the segments section is being processed.
-                   continue
-
 
-               if mode == "nodes":
-                   # Processes a line in the nodes section.
-                   name, x, y = line.split(',')
-                   AddNode(g, Node(name, float(x), float(y)))
-               elif mode == "segments":
-                   # Processes a line in the segments section.
-                   segment_id, origin_name, destination_name = line.split(',')
-                   AddSegment(g, segment_id, origin_name, destination_name)
-       return g
+               fields = line.split(',')
+               if mode is None:
+                   report.AddError(line_number, line, "line outside of a Nodes: or Segments: section", max_errors)
+               elif len(fields) != 3:
+                   report.AddError(line_number, line, f"expected 3 fields, found {len(fields)}", max_errors)
+               elif mode == "nodes":
+                   try:
+                       nodes.append((line_number, line, Node(fields[0], float(fields[1]), float(fields[2]))))
+                   except ValueError:
+                       report.AddError(line_number, line, "coordinates are not numbers", max_errors)
+               else:
+                   segments.append((line_number, line, fields[0], fields[1], fields[2]))
+           InsertParsed(g, report, nodes, segments, max_errors)
+           report.Flush(max_errors)
+           report.lines = line_number
+           if progress is not None and progress(report, file.buffer.tell()) is False:
+               report.cancelled = True
+               break
+   report.elapsed = time.perf_counter() - start
+   Scanned(report.lines)
+   return g, report
+
+
+@Instrumented
+def LoadGraphFromFile(file_path):
+   # Loads a graph from a text file with nodes and segments data.
+   # Malformed lines are skipped and printed with their line numbers; returns None if the file cannot be read.
+   try:
+       g, report = StreamGraphFromFile(file_path)
    except FileNotFoundError:
        # Handles the case where the file is not found.
        print(f"Error: File '{file_path}' not found.")
        return None
-   except Exception as e:
-       # Handles any other errors that occur during file processing.
+   except (OSError, UnicodeDecodeError) as e:
+       # Handles any other errors that occur while reading the file.
        print(f"Error loading graph: {e}")
        return None
-
-
-def DeleteSegment(g, segment_id):
-    segment_to_delete = None
-    for segment in g.segments:
-        if segment.id == segment_id:
-            segment_to_delete = segment
-            break
-
-    if segment_to_delete:
-        g.segments.remove(segment_to_delete)
-        # También quitamos al destino como vecino del origen si estaba
-        if segment_to_delete.destination in segment_to_delete.origin.neighbors:
-            segment_to_delete.origin.neighbors.remove(segment_to_delete.destination)
-        return True
-    return False
+   for line_number, line, reason in report.errors:
+       print(f"Line {line_number}: {reason}: '{line}'")
+   if report.error_count > len(report.errors):
+       print(f"... {report.error_count - len(report.errors)} more malformed lines")
+   return g
+
+
+@Instrumented
+def SaveGraphToFile(g, file_path):
+   # Saves the graph 'g' to a text file in the format read by LoadGraphFromFile:
+   # a "Nodes:" section with one "name,x,y" line per node and a "Segments:" section with one "id,origin,destination" line per segment.
+   # Returns True if the file was written, False otherwise.
+   try:
+       with open(file_path, 'w') as file:
+           file.write("Nodes:\n")
+           for node in g.nodes:
+               file.write(f"{node.name},{node.x},{node.y}\n")
+           file.write("\nSegments:\n")
+           for segment in g.segments:
+               file.write(f"{segment.id},{segment.origin.name},{segment.destination.name}\n")
+       return True
+   except OSError as e:
+       # Handles any error that occurs while writing the file.
+       print(f"Error saving graph: {e}")
+       return False
@@ -0,0 +1,229 @@
+import mmap
+import os
+import struct
+import sys
+from array import array
+from graph import Graph, AddNodes, AddSegment, AddSegments
+from instrument import Instrumented
+from node import Node
+from snapshot import GraphSnapshot
+# `mmap` maps the binary file into memory so its arrays can be read without copying them.
+# `os` reads the size of a file before mapping it.
+# `struct` packs and unpacks the fixed-size header.
+# `Graph`, `AddNodes`, `AddSegments` and `Node` rebuild an editable graph from a binary file or any snapshot.
+# `GraphSnapshot` is the read-only CSR view returned when a binary file is opened.
+# `Instrumented` records the calls of the loader while instrumentation is enabled.
+
+# Layout of a binary graph file. Every number is little-endian and every array starts at a multiple of 8 bytes.
+#   header        magic, node count n, segment count m, size of the names blob, size of the ids blob
+#   xs, ys        n doubles each: node coordinates
+#   offsets       n + 1 int64: CSR offsets, the segments of node i are entries offsets[i] to offsets[i + 1] - 1
+#   targets       m int64: index of the destination node of each segment
+#   costs         m doubles: cost of each segment
+#   name_offsets  n + 1 int64: node i is called names_blob[name_offsets[i]:name_offsets[i + 1]]
+#   name_order    n int64: node indices sorted by name, used to look names up by binary search
+#   id_offsets    m + 1 int64: segment e has id ids_blob[id_offsets[e]:id_offsets[e + 1]]
+#   segment_order m int64: positions of the segments in the order they were added to the graph
+#   names_blob    UTF-8 node names, one after another
+#   ids_blob      UTF-8 segment ids, one after another
+# Files written before segment_order existed start with OLD_MAGIC and have no such section; their segments are read
+# back grouped by origin.
+MAGIC = b'GRAPHBN2'
+OLD_MAGIC = b'GRAPHBN1'
+HEADER = struct.Struct('<8sQQQQ')
+
+
+class StringTable:
+    # This class represents a read-only sequence of strings stored as one UTF-8 blob plus an offsets array.
+    # Strings are only decoded when they are accessed.
+    def __init__(self, offsets, blob, order=None):
+        # offsets: int64 array of len(table) + 1 positions in 'blob'.
+        # order: optional int64 array of the positions sorted by their string, which enables get().
+        self.offsets = offsets
+        self.blob = blob
+        self.order = order
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("string table index out of range")
+        return bytes(self.blob[self.offsets[i]:self.offsets[i + 1]]).decode('utf-8')
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def RawAt(self, i):
+        # Returns the encoded bytes of string i without decoding them.
+        return bytes(self.blob[self.offsets[i]:self.offsets[i + 1]])
+
+    def get(self, name, default=None):
+        # Returns the position of the string 'name', or 'default' if it is not in the table.
+        # Runs a binary search over the sorted order, decoding only O(log n) strings.
+        key = name.encode('utf-8')
+        low, high = 0, len(self.order)
+        while low < high:
+            middle = (low + high) // 2
+            if self.RawAt(self.order[middle]) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(self.order) and self.RawAt(self.order[low]) == key:
+            return self.order[low]
+        return default
+
+
+def Padding(size):
+    # Returns the number of zero bytes needed after 'size' bytes to reach a multiple of 8.
+    return -size % 8
+
+
+def ArrayBytes(values):
+    # Returns the bytes of an array in little-endian order followed by the padding that keeps the next array aligned.
+    if sys.byteorder != 'little':
+        values = array(values.typecode, values)
+        values.byteswap()
+    data = values.tobytes()
+    return data + b'\0' * Padding(len(data))
+
+
+def EncodeStrings(strings):
+    # Encodes a list of strings as (offsets array, blob bytes).
+    encoded = [str(s).encode('utf-8') for s in strings]
+    offsets = array('q', [0])
+    total = 0
+    for item in encoded:
+        total += len(item)
+        offsets.append(total)
+    return offsets, b''.join(encoded)
+
+
+def EncodeGraph(s):
+    # Returns the list of byte strings that make up the binary form of the snapshot 's', in the order of the layout.
+    name_offsets, names_blob = EncodeStrings(s.names)
+    id_offsets, ids_blob = EncodeStrings(s.segment_ids)
+    encoded_names = [names_blob[name_offsets[i]:name_offsets[i + 1]] for i in range(len(s))]
+    name_order = array('q', sorted(range(len(s)), key=encoded_names.__getitem__))
+    header = HEADER.pack(MAGIC, len(s), len(s.targets), len(names_blob), len(ids_blob))
+    return [header + b'\0' * Padding(HEADER.size),
+            ArrayBytes(array('d', s.xs)), ArrayBytes(array('d', s.ys)),
+            ArrayBytes(array('q', s.offsets)), ArrayBytes(array('q', s.targets)), ArrayBytes(array('d', s.costs)),
+            ArrayBytes(name_offsets), ArrayBytes(name_order), ArrayBytes(id_offsets),
+            ArrayBytes(array('q', s.SegmentOrder())), names_blob, ids_blob]
+
+
+@Instrumented
+def SaveGraphToBinary(g, file_path):
+    # Saves the graph 'g' to 'file_path' in the binary format described above.
+    # Segment ids are stored as strings. Returns True on success, False if the file cannot be written.
+    parts = EncodeGraph(g.Freeze())
+    try:
+        with open(file_path, 'wb') as file:
+            for part in parts:
+                file.write(part)
+        return True
+    except OSError as e:
+        print(f"Error saving graph: {e}")
+        return False
+
+
+def ReadGraph(buffer, label):
+    # Returns (snapshot, end): a GraphSnapshot whose arrays point straight into 'buffer' (a memory-mapped file or a
+    # shared memory block holding the binary layout) and the position where the layout ends.
+    # 'label' names the buffer in error messages. Raises ValueError if the buffer does not hold a binary graph.
+    if len(buffer) < HEADER.size:
+        raise ValueError(f"'{label}' is not a binary graph file")
+    magic, n, m, names_size, ids_size = HEADER.unpack_from(buffer, 0)
+    if magic != MAGIC and magic != OLD_MAGIC:
+        raise ValueError(f"'{label}' is not a binary graph file")
+
+    view = memoryview(buffer)
+    position = HEADER.size + Padding(HEADER.size)
+
+    def Take(typecode, count):
+        # Returns a view of the next 'count' items of type 'typecode' and advances the position.
+        nonlocal position
+        size = 8 * count
+        if position + size > len(buffer):
+            raise ValueError(f"'{label}' is truncated")
+        part = view[position:position + size]
+        position += size
+        if sys.byteorder != 'little':
+            # Big-endian machines cannot use the buffer directly, so this array is copied and swapped.
+            values = array(typecode, part.tobytes())
+            values.byteswap()
+            return values
+        return part.cast(typecode)
+
+    xs = Take('d', n)
+    ys = Take('d', n)
+    offsets = Take('q', n + 1)
+    targets = Take('q', m)
+    costs = Take('d', m)
+    name_offsets = Take('q', n + 1)
+    name_order = Take('q', n)
+    id_offsets = Take('q', m + 1)
+    segment_order = Take('q', m) if magic == MAGIC else None
+    if position + names_size + ids_size > len(buffer):
+        raise ValueError(f"'{label}' is truncated")
+    names_blob = view[position:position + names_size]
+    ids_blob = view[position + names_size:position + names_size + ids_size]
+    end = position + names_size + ids_size
+
+    names = StringTable(name_offsets, names_blob, name_order)
+    return GraphSnapshot(names, xs, ys, offsets, targets, costs, StringTable(id_offsets, ids_blob), segment_order,
+                         names), end
+
+
+def OpenGraphBinary(file_path):
+    # Opens a binary graph file and returns a GraphSnapshot whose arrays point straight into the mapped file.
+    # Nothing is parsed or copied, so opening takes about the same time for any graph size.
+    # Raises OSError if the file cannot be opened and ValueError if it is not a binary graph file.
+    with open(file_path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            # An empty file cannot be mapped; it is reported like any other file without a header.
+            raise ValueError(f"'{file_path}' is not a binary graph file")
+        buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    s, _ = ReadGraph(buffer, file_path)
+    s.buffer = buffer  # Keeps the mapping alive as long as the snapshot is used.
+    return s
+
+
+@Instrumented
+def LoadGraphFromBinary(file_path):
+    # Loads a binary graph file into an editable Graph. Returns None if the file cannot be read.
+    try:
+        s = OpenGraphBinary(file_path)
+    except FileNotFoundError:
+        print(f"Error: File '{file_path}' not found.")
+        return None
+    except (OSError, ValueError) as e:
+        print(f"Error loading graph: {e}")
+        return None
+    return GraphFromSnapshot(s)
+
+
+def GraphFromSnapshot(s):
+    # Builds an editable Graph with the nodes and segments of the GraphSnapshot 's'.
+    g = Graph()
+    names = list(s.names)
+    AddNodes(g, [Node(name, x, y) for name, x, y in zip(names, s.xs, s.ys)])
+    offsets = s.offsets
+    origin_names = [names[i] for i in range(len(names)) for _ in range(offsets[i + 1] - offsets[i])]
+    destination_names = [names[j] for j in s.targets]
+    segment_ids = list(s.segment_ids)
+    order = s.SegmentOrder()
+    if not isinstance(order, range):
+        # The segments are added in the order they had in the original graph, not grouped by origin.
+        origin_names = [origin_names[e] for e in order]
+        destination_names = [destination_names[e] for e in order]
+        segment_ids = [segment_ids[e] for e in order]
+    if not AddSegments(g, segment_ids, origin_names, destination_names):
+        # Ids that only differed in their type before being stored as strings now collide: the first one is kept.
+        for segment_id, origin, destination in zip(segment_ids, origin_names, destination_names):
+            AddSegment(g, segment_id, origin, destination)
+    return g
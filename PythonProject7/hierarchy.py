@@ -0,0 +1,390 @@
+import heapq
+import math
+import mmap
+import struct
+import sys
+import zlib
+from array import array
+from graph_binary import ArrayBytes, EncodeGraph, EncodeStrings, Padding, ReadGraph
+from instrument import Instrumented, Scanned
+from node import Node
+from path import Path
+from snapshot import GraphSnapshot
+# `heapq` orders the nodes to contract and runs the witness searches and the queries.
+# `zlib.crc32` fingerprints the graph file a saved hierarchy was built from and the graph itself, so a hierarchy left
+# over from an older version of the file, or from before the graph was edited, is never used.
+# The hierarchy file starts with the binary graph layout (see graph_binary.py), so it can answer queries on its own.
+
+# Layout of the hierarchy section that follows the graph in a hierarchy file (little-endian, 8-byte aligned):
+#   header        magic, size and CRC-32 of the graph file it was built from (-1 and 0 if none),
+#                 GraphFingerprint of the graph, number of upward edges u, number of downward edges d
+#   rank          n int64: position of each node in the contraction order
+#   up            n + 1 offsets, then u targets, u costs, u middle nodes and u segment positions
+#   down          the same with n + 1 offsets and d edges
+HIERARCHY_MAGIC = b'GRAPHCH2'
+HIERARCHY_HEADER = struct.Struct('<8sqQQQQ')
+
+# Number of nodes a witness search may settle before giving up. A search that gives up only adds a shortcut that
+# was not needed, so a small limit keeps the preprocessing fast without affecting the routes.
+WITNESS_LIMIT = 50
+
+
+class ContractionHierarchy:
+    # This class represents a contraction hierarchy over a GraphSnapshot. Every node has a rank (the order in which it
+    # was contracted) and the edges are split in two CSR graphs that only go towards higher ranks:
+    #   up: the edges i -> j with rank[j] > rank[i], stored at i and followed by the search from the origin.
+    #   down: the edges j -> i with rank[j] > rank[i], stored at i and followed backwards from the destination.
+    # An edge is a segment of the snapshot (middle -1, edge = its position) or a shortcut that replaces the two edges
+    # i -> middle -> j (middle is the node whose contraction created it, edge -1).
+    # A query searches upwards from both ends and the cheapest meeting point gives the same cost as Dijkstra.
+    def __init__(self, snapshot, rank, up, down):
+        # up and down: (offsets, targets, costs, middles, edges) arrays.
+        self.snapshot = snapshot
+        self.rank = rank
+        self.up_offsets, self.up_targets, self.up_costs, self.up_middles, self.up_edges = up
+        self.down_offsets, self.down_targets, self.down_costs, self.down_middles, self.down_edges = down
+        # Version of the graph the hierarchy was built for or attached to (see PrepareHierarchy). Any later change
+        # to the graph makes it stale.
+        self.version = None
+        self.source = (-1, 0)  # (size, CRC-32) of the graph file the hierarchy was built from.
+        self.fingerprint = None  # GraphFingerprint of the snapshot, once it has been computed.
+
+    def IsStale(self, g):
+        # Returns True if the graph 'g' has changed since the hierarchy was built for it.
+        return self.version != g.version
+
+    def FindPath(self, origin_name, destination_name, g=None):
+        # Returns the cheapest Path between the two nodes, or None if a node is unknown or there is no route.
+        # With a Graph 'g' the nodes of the path are the Node objects of 'g'; otherwise they are new Node objects
+        # made from the snapshot. The cost is added up along the segments of the path, like Dijkstra does.
+        s = self.snapshot
+        origin = s.IndexOf(origin_name)
+        destination = s.IndexOf(destination_name)
+        if origin is None or destination is None:
+            return None
+        meeting, forward, backward, expanded = self.Search(origin, destination)
+        if meeting is None:
+            return None
+
+        edges = []  # Positions of the segments of the path in the snapshot, in order.
+        chain = []
+        i = meeting
+        while forward[i][1] != -1:
+            parent, k = forward[i]
+            chain.append((parent, i, self.up_middles[k], self.up_edges[k]))
+            i = parent
+        for tail, head, middle, edge in reversed(chain):
+            self.Unpack(tail, head, middle, edge, edges)
+        i = meeting
+        while backward[i][1] != -1:
+            child, k = backward[i]
+            self.Unpack(i, child, self.down_middles[k], self.down_edges[k], edges)
+            i = child
+
+        path = Path()
+        path.expanded = expanded
+        order = [origin]
+        for e in edges:
+            path.cost += s.costs[e]
+            path.segment_ids.append(s.segment_ids[e])
+            order.append(s.targets[e])
+        if g is not None:
+            path.nodes = [g.GetNodeByName(s.names[i]) for i in order]
+        else:
+            path.nodes = [Node(s.names[i], s.xs[i], s.ys[i]) for i in order]
+        return path
+
+    def Search(self, origin, destination):
+        # Runs the two upward searches. Returns (meeting node, forward labels, backward labels, nodes settled): the
+        # labels map each reached node to (neighbor it was reached from, edge position), (None, -1) for the ends.
+        # Returns a None meeting node if the destination cannot be reached.
+        forward = {origin: (None, -1)}
+        backward = {destination: (None, -1)}
+        costs = ({origin: 0.0}, {destination: 0.0})
+        heaps = ([(0.0, origin)], [(0.0, destination)])
+        graphs = ((self.up_offsets, self.up_targets, self.up_costs), (self.down_offsets, self.down_targets,
+                                                                       self.down_costs))
+        labels = (forward, backward)
+        best, meeting = math.inf, None
+        expanded = 0
+        while True:
+            # Each step advances the side whose next node is cheaper; a side stops once it cannot beat 'best'.
+            top = [heap[0][0] if heap and heap[0][0] < best else math.inf for heap in heaps]
+            if top[0] == math.inf and top[1] == math.inf:
+                break
+            side = 0 if top[0] <= top[1] else 1
+            cost, i = heapq.heappop(heaps[side])
+            if cost > costs[side][i]:
+                continue  # Stale entry left behind by a later improvement.
+            expanded += 1
+            other = costs[1 - side].get(i)
+            if other is not None and cost + other < best:
+                best, meeting = cost + other, i
+            offsets, targets, edge_costs = graphs[side]
+            mine, label = costs[side], labels[side]
+            for k in range(offsets[i], offsets[i + 1]):
+                j = targets[k]
+                new_cost = cost + edge_costs[k]
+                if new_cost < mine.get(j, math.inf):
+                    mine[j] = new_cost
+                    label[j] = (i, k)
+                    heapq.heappush(heaps[side], (new_cost, j))
+        return meeting, forward, backward, expanded
+
+    def Unpack(self, tail, head, middle, edge, edges):
+        # Appends to 'edges' the snapshot positions of the segments that the edge tail -> head stands for.
+        # Shortcuts are expanded with an explicit stack, so deep hierarchies do not hit the recursion limit.
+        stack = [(tail, head, middle, edge)]
+        while stack:
+            tail, head, middle, edge = stack.pop()
+            if middle == -1:
+                edges.append(edge)
+                continue
+            # The two halves were the edges of 'middle' when it was contracted, so both are stored at it:
+            # tail -> middle among its down edges and middle -> head among its up edges.
+            first = self.FindEdge(self.down_offsets, self.down_targets, middle, tail)
+            second = self.FindEdge(self.up_offsets, self.up_targets, middle, head)
+            stack.append((middle, head, self.up_middles[second], self.up_edges[second]))
+            stack.append((tail, middle, self.down_middles[first], self.down_edges[first]))
+
+    @staticmethod
+    def FindEdge(offsets, targets, i, j):
+        # Returns the position of the edge between i and j among the edges stored at i.
+        for k in range(offsets[i], offsets[i + 1]):
+            if targets[k] == j:
+                return k
+        raise ValueError(f"hierarchy has no edge between nodes {i} and {j}")
+
+
+def WitnessCosts(out_edges, source, skipped, targets, max_cost, limit):
+    # Runs a Dijkstra search from 'source' that never enters 'skipped' and returns the cheapest costs found.
+    # It stops when every node of 'targets' is settled, when the costs go over 'max_cost', or after 'limit' nodes.
+    best = {source: 0.0}
+    heap = [(0.0, source)]
+    remaining = len(targets)
+    settled = 0
+    while heap:
+        cost, i = heapq.heappop(heap)
+        if cost > best[i]:
+            continue
+        if cost > max_cost:
+            break
+        if i in targets:
+            remaining -= 1
+            if remaining == 0:
+                break
+        settled += 1
+        if settled > limit:
+            break
+        for j, record in out_edges[i].items():
+            new_cost = cost + record[0]
+            if j != skipped and new_cost < best.get(j, math.inf):
+                best[j] = new_cost
+                heapq.heappush(heap, (new_cost, j))
+    return best
+
+
+def FindShortcuts(out_edges, in_edges, i, limit):
+    # Returns the shortcuts (tail, head, cost) needed to contract node i: one for every route tail -> i -> head
+    # without a route of the same or lower cost that avoids i.
+    shortcuts = []
+    for tail, (tail_cost, _, _) in in_edges[i].items():
+        targets = {head: tail_cost + record[0] for head, record in out_edges[i].items() if head != tail}
+        if not targets:
+            continue
+        best = WitnessCosts(out_edges, tail, i, targets, max(targets.values()), limit)
+        for head, cost in targets.items():
+            if best.get(head, math.inf) > cost:
+                shortcuts.append((tail, head, cost))
+    return shortcuts
+
+
+def PackEdges(lists):
+    # Turns one list of (target, cost, middle, edge) per node into the CSR arrays of ContractionHierarchy.
+    offsets = array('q', [0])
+    targets, costs, middles, edges = array('q'), array('d'), array('q'), array('q')
+    for items in lists:
+        for target, (cost, middle, edge) in sorted(items.items()):
+            targets.append(target)
+            costs.append(cost)
+            middles.append(middle)
+            edges.append(edge)
+        offsets.append(len(targets))
+    return offsets, targets, costs, middles, edges
+
+
+@Instrumented
+def BuildHierarchy(g, witness_limit=WITNESS_LIMIT):
+    # Builds the ContractionHierarchy of 'g' (a Graph, frozen first, or a GraphSnapshot).
+    # Nodes are contracted in order of edge difference (shortcuts added minus edges removed) plus the number of
+    # neighbors already contracted, which spreads the contractions over the graph. The priorities are updated
+    # lazily: a node is only contracted if its recomputed priority is still the lowest.
+    # Takes about 40 s for 100 000 nodes; save the result with SaveHierarchy or use PrepareHierarchy.
+    s = g if isinstance(g, GraphSnapshot) else g.Freeze()
+    n = len(s)
+    # Remaining graph: out_edges[i][j] and in_edges[j][i] hold (cost, middle, edge) of the cheapest edge i -> j.
+    out_edges = [{} for _ in range(n)]
+    in_edges = [{} for _ in range(n)]
+    offsets, targets, costs = s.offsets, s.targets, s.costs
+    for i in range(n):
+        for e in range(offsets[i], offsets[i + 1]):
+            j = targets[e]
+            if j != i and (j not in out_edges[i] or costs[e] < out_edges[i][j][0]):
+                out_edges[i][j] = in_edges[j][i] = (costs[e], -1, e)
+    Scanned(n + len(targets))
+
+    def Priority(i):
+        shortcuts = FindShortcuts(out_edges, in_edges, i, witness_limit)
+        return len(shortcuts) - len(out_edges[i]) - len(in_edges[i]) + contracted_neighbors[i], shortcuts
+
+    contracted_neighbors = [0] * n
+    heap = [(Priority(i)[0], i) for i in range(n)]
+    heapq.heapify(heap)
+    rank = array('q', bytes(8 * n))
+    up, down = [None] * n, [None] * n
+    order = 0
+    while heap:
+        _, i = heapq.heappop(heap)
+        priority, shortcuts = Priority(i)
+        if heap and priority > heap[0][0]:
+            heapq.heappush(heap, (priority, i))
+            continue
+        rank[i] = order
+        order += 1
+        # The edges left at i all lead to nodes contracted later, so they are its upward edges.
+        up[i], down[i] = out_edges[i], in_edges[i]
+        for j in out_edges[i]:
+            del in_edges[j][i]
+            contracted_neighbors[j] += 1
+        for j in in_edges[i]:
+            del out_edges[j][i]
+            contracted_neighbors[j] += 1
+        out_edges[i], in_edges[i] = {}, {}
+        for tail, head, cost in shortcuts:
+            current = out_edges[tail].get(head)
+            if current is None or cost < current[0]:
+                out_edges[tail][head] = in_edges[head][tail] = (cost, i, -1)
+    return ContractionHierarchy(s, rank, PackEdges(up), PackEdges(down))
+
+
+def FileFingerprint(file_path):
+    # Returns (size, CRC-32) of the file 'file_path'. Raises OSError if it cannot be read.
+    size, crc = 0, 0
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            size += len(block)
+            crc = zlib.crc32(block, crc)
+    return size, crc
+
+
+def GraphFingerprint(s):
+    # Returns a CRC-32 of the names, coordinates, segments, costs and segment ids of the GraphSnapshot 's'. Two
+    # snapshots with the same fingerprint describe the same graph, so a saved hierarchy still fits it.
+    crc = 0
+    for values, typecode in ((s.xs, 'd'), (s.ys, 'd'), (s.offsets, 'q'), (s.targets, 'q'), (s.costs, 'd')):
+        crc = zlib.crc32(ArrayBytes(array(typecode, values)), crc)
+    for strings in (s.names, s.segment_ids):
+        offsets, blob = EncodeStrings(strings)
+        crc = zlib.crc32(blob, zlib.crc32(ArrayBytes(offsets), crc))
+    return crc
+
+
+def HierarchyPath(graph_file_path):
+    # Returns the path of the hierarchy file kept next to the graph file 'graph_file_path'.
+    return graph_file_path + '.ch'
+
+
+@Instrumented
+def SaveHierarchy(h, file_path, graph_file_path=None):
+    # Saves the hierarchy 'h' with its snapshot to 'file_path'. 'graph_file_path' is the graph file it was built from:
+    # its fingerprint is stored so LoadHierarchy can tell when that file has changed.
+    # Returns True if the file was written, False otherwise.
+    try:
+        size, crc = FileFingerprint(graph_file_path) if graph_file_path is not None else h.source
+        if h.fingerprint is None:
+            h.fingerprint = GraphFingerprint(h.snapshot)
+        parts = EncodeGraph(h.snapshot)
+        total = sum(len(part) for part in parts)
+        parts.append(b'\0' * Padding(total))
+        parts.append(HIERARCHY_HEADER.pack(HIERARCHY_MAGIC, size, crc, h.fingerprint, len(h.up_targets),
+                                           len(h.down_targets)))
+        parts.append(ArrayBytes(array('q', h.rank)))
+        for values, typecode in ((h.up_offsets, 'q'), (h.up_targets, 'q'), (h.up_costs, 'd'), (h.up_middles, 'q'),
+                                 (h.up_edges, 'q'), (h.down_offsets, 'q'), (h.down_targets, 'q'),
+                                 (h.down_costs, 'd'), (h.down_middles, 'q'), (h.down_edges, 'q')):
+            parts.append(ArrayBytes(array(typecode, values)))
+        with open(file_path, 'wb') as file:
+            for part in parts:
+                file.write(part)
+        h.source = (size, crc)
+        return True
+    except OSError as e:
+        print(f"Error saving hierarchy: {e}")
+        return False
+
+
+def LoadHierarchy(file_path, graph_file_path=None):
+    # Opens a hierarchy file written by SaveHierarchy; its arrays point straight into the mapped file.
+    # With 'graph_file_path', returns None if that file is not the one the hierarchy was built from (the hierarchy
+    # is stale). Raises OSError if a file cannot be read and ValueError if 'file_path' is not a hierarchy file.
+    with open(file_path, 'rb') as file:
+        buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    s, end = ReadGraph(buffer, file_path)
+    position = end + Padding(end)
+    if position + HIERARCHY_HEADER.size > len(buffer):
+        raise ValueError(f"'{file_path}' is not a hierarchy file")
+    magic, size, crc, fingerprint, up_count, down_count = HIERARCHY_HEADER.unpack_from(buffer, position)
+    if magic != HIERARCHY_MAGIC:
+        raise ValueError(f"'{file_path}' is not a hierarchy file")
+    if graph_file_path is not None and FileFingerprint(graph_file_path) != (size, crc):
+        return None
+    position += HIERARCHY_HEADER.size
+    view = memoryview(buffer)
+    n = len(s)
+
+    def Take(typecode, count):
+        nonlocal position
+        if position + 8 * count > len(buffer):
+            raise ValueError(f"'{file_path}' is truncated")
+        part = view[position:position + 8 * count]
+        position += 8 * count
+        if sys.byteorder != 'little':
+            values = array(typecode, part.tobytes())
+            values.byteswap()
+            return values
+        return part.cast(typecode)
+
+    rank = Take('q', n)
+    up = (Take('q', n + 1), Take('q', up_count), Take('d', up_count), Take('q', up_count), Take('q', up_count))
+    down = (Take('q', n + 1), Take('q', down_count), Take('d', down_count), Take('q', down_count),
+            Take('q', down_count))
+    h = ContractionHierarchy(s, rank, up, down)
+    h.source = (size, crc)
+    h.fingerprint = fingerprint
+    s.buffer = buffer  # Keeps the mapping alive as long as the hierarchy is used.
+    return h
+
+
+@Instrumented
+def PrepareHierarchy(g, graph_file_path=None):
+    # Attaches a contraction hierarchy to the graph 'g', so Dijkstra and FindPath without a heuristic use it until
+    # the graph changes. With 'graph_file_path' (the file 'g' was loaded from), the hierarchy saved next to it is
+    # reused if both that file and the graph 'g' are the ones it was built from; otherwise it is built and saved
+    # there for the next time. Returns the hierarchy.
+    h = None
+    s = g.Freeze()
+    if graph_file_path is not None:
+        try:
+            h = LoadHierarchy(HierarchyPath(graph_file_path), graph_file_path)
+        except (OSError, ValueError):
+            h = None
+        # 'g' may have been edited since it was loaded from the file.
+        if h is not None and h.fingerprint != GraphFingerprint(s):
+            h = None
+    if h is None:
+        h = BuildHierarchy(s)
+        if graph_file_path is not None:
+            SaveHierarchy(h, HierarchyPath(graph_file_path), graph_file_path)
+    h.version = g.version
+    g.hierarchy = h
+    return h
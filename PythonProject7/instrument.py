@@ -0,0 +1,199 @@
+import functools
+import threading
+import time
+from collections import deque
+# `time.perf_counter` measures each call, `deque` keeps the most recent durations for the percentiles.
+# `threading` keeps the calls of the background loader apart from the ones of the interface.
+
+# Instrumentation is off by default. While it is off an instrumented function only pays for one flag check.
+enabled = False
+# Number of recent durations kept per operation to compute the percentiles.
+SAMPLE_SIZE = 4096
+
+lock = threading.Lock()
+local = threading.local()  # local.stack: [operation name, items scanned] of the calls running in this thread.
+stats = {}  # Operation name -> OperationStats.
+# (name, seconds, items) of the most recent calls that were not nested inside another instrumented call.
+history = deque(maxlen=256)
+top_level_calls = 0  # Number of top-level calls recorded, including the ones that left 'history'.
+
+
+class OperationStats:
+    # This class represents what has been recorded for one operation (a function or a Graph method).
+    def __init__(self, name):
+        # calls: number of calls. total: cumulative seconds, nested calls included. items: items scanned.
+        # samples: the durations of the last SAMPLE_SIZE calls, in seconds.
+        self.name = name
+        self.calls = 0
+        self.total = 0.0
+        self.maximum = 0.0
+        self.items = 0
+        self.samples = deque(maxlen=SAMPLE_SIZE)
+
+    def Copy(self):
+        # Returns an independent copy, which later calls do not change.
+        copy = OperationStats(self.name)
+        copy.calls = self.calls
+        copy.total = self.total
+        copy.maximum = self.maximum
+        copy.items = self.items
+        copy.samples = deque(self.samples, maxlen=SAMPLE_SIZE)
+        return copy
+
+    def Mean(self):
+        return self.total / self.calls if self.calls else 0.0
+
+    def Percentile(self, p):
+        # Returns the duration below which 'p' percent of the recent calls fall (0 if there are none).
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+    def AsDict(self):
+        # Returns the statistics as a dictionary of plain numbers, in seconds.
+        return {'calls': self.calls, 'total': self.total, 'mean': self.Mean(), 'p50': self.Percentile(50),
+                'p90': self.Percentile(90), 'p99': self.Percentile(99), 'max': self.maximum, 'items': self.items}
+
+
+def Instrumented(function):
+    # Decorator that records the calls of 'function' under its qualified name ("AddNode", "Graph.GetNodeByName")
+    # while instrumentation is enabled.
+    name = function.__qualname__
+
+    @functools.wraps(function)
+    def Wrapper(*args, **kwargs):
+        if not enabled:
+            return function(*args, **kwargs)
+        return Record(name, function, args, kwargs)
+
+    return Wrapper
+
+
+def Record(name, function, args, kwargs):
+    # Runs one call of an instrumented function, timing it.
+    global top_level_calls
+    stack = getattr(local, 'stack', None)
+    if stack is None:
+        stack = local.stack = []
+    frame = [name, 0]
+    stack.append(frame)
+    start = time.perf_counter()
+    try:
+        return function(*args, **kwargs)
+    finally:
+        seconds = time.perf_counter() - start
+        stack.pop()
+        with lock:
+            operation = stats.get(name)
+            if operation is None:
+                operation = stats[name] = OperationStats(name)
+            operation.calls += 1
+            operation.total += seconds
+            operation.items += frame[1]
+            operation.samples.append(seconds)
+            if seconds > operation.maximum:
+                operation.maximum = seconds
+            if not stack:
+                history.append((name, seconds, frame[1]))
+                top_level_calls += 1
+
+
+def Scanned(count):
+    # Adds 'count' items (nodes, segments, lines...) to the work of the innermost instrumented call running.
+    if enabled:
+        stack = getattr(local, 'stack', None)
+        if stack:
+            stack[-1][1] += count
+
+
+def Enable():
+    global enabled
+    enabled = True
+
+
+def Disable():
+    global enabled
+    enabled = False
+
+
+def Reset():
+    # Forgets everything recorded so far.
+    global top_level_calls
+    with lock:
+        stats.clear()
+        history.clear()
+        top_level_calls = 0
+
+
+def GetStats(name=None):
+    # Returns the OperationStats of the operation 'name' (None if it was never called), or a dictionary
+    # with all the operations when no name is given. They are copies taken at the time of the call, so they do not
+    # change while instrumented calls keep running and changing them does not affect what is recorded.
+    with lock:
+        if name is None:
+            return {key: operation.Copy() for key, operation in stats.items()}
+        operation = stats.get(name)
+        return None if operation is None else operation.Copy()
+
+
+def LastOperation():
+    # Returns (name, seconds, items scanned) of the last top-level instrumented call, or None.
+    with lock:
+        return history[-1] if history else None
+
+
+def RecentOperations(since=0):
+    # Returns (mark, calls): the top-level calls recorded after the first 'since' ones (at most the last 256),
+    # and the mark to pass as 'since' next time to only get newer calls.
+    with lock:
+        count = max(0, min(top_level_calls - since, len(history)))
+        return top_level_calls, list(history)[len(history) - count:]
+
+
+def FormatOperation(operation):
+    # Returns a short text such as "AddNode: 0.02 ms" for a (name, seconds, items) tuple.
+    name, seconds, items = operation
+    text = f"{name}: {seconds * 1000:.2f} ms"
+    if items:
+        text += f", {items} items"
+    return text
+
+
+def Report():
+    # Returns a text table with the statistics of every operation, slowest in total first. Times are in ms.
+    lines = [f"{'operation':32} {'calls':>9} {'total':>10} {'mean':>9} {'p50':>9} {'p90':>9} {'p99':>9} {'items':>10}"]
+    for operation in sorted(GetStats().values(), key=lambda o: o.total, reverse=True):
+        d = operation.AsDict()
+        lines.append(f"{operation.name:32} {d['calls']:9d} {d['total'] * 1000:10.2f} {d['mean'] * 1000:9.4f} "
+                     f"{d['p50'] * 1000:9.4f} {d['p90'] * 1000:9.4f} {d['p99'] * 1000:9.4f} {d['items']:10d}")
+    return "\n".join(lines)
+
+
+class Profiling:
+    # Context manager that enables the instrumentation inside a 'with' block and restores the previous state after:
+    #     with Profiling() as profile:
+    #         LoadGraphFromFile("graph_data.txt")
+    #     print(profile.Report())
+    # With reset=True (the default) the block starts from empty statistics.
+    def __init__(self, reset=True):
+        self.reset = reset
+        self.was_enabled = False
+
+    def __enter__(self):
+        self.was_enabled = enabled
+        if self.reset:
+            Reset()
+        Enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        if not self.was_enabled:
+            Disable()
+        return False
+
+    def GetStats(self, name=None):
+        return GetStats(name)
+
+    def Report(self):
+        return Report()
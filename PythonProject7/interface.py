@@ -1,11 +1,26 @@
+import math
+import os
+import queue
+import threading
 import tkinter as tk
 from tkinter import filedialog, messagebox, simpledialog
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from matplotlib.figure import Figure
-from graph import Graph, AddNode, AddSegment, DeleteNode, DeleteSegment, LoadGraphFromFile, SaveGraphToFile
+from matplotlib.patches import Rectangle
+from graph import Graph, AddNode, AddSegment, DeleteNode, DeleteSegment, StreamGraphFromFile, SaveGraphToFile, \
+    GetClosest, GetClosestSegment, GetNodesInRectangle, GetSegmentsInRectangle
+from graph_binary import LoadGraphFromBinary, SaveGraphToBinary
+import instrument
 from node import Node
+from path import ReachableWithin
+from listview import VirtualList
+from render import GraphView
 from segment import Segment
+from spatial import SegmentDistance
+
+# Un clic a menos de estos píxeles de un nodo o segmento lo selecciona en vez de crear un nodo
+CLICK_PIXELS = 6
 
 
 class GraphInterface:
@@ -15,6 +30,7 @@ class GraphInterface:
         self.root.geometry("1000x750")
 
         self.graph = Graph()
+        self.loader = None  # Hilo que está cargando un fichero, si lo hay
 
         self.setup_ui()
         self.setup_figure()
@@ -37,12 +53,14 @@ class GraphInterface:
             ("Show Custom Graph", self.show_custom_graph),
             ("Create Empty Graph", self.create_empty_graph),
             ("Load Graph from File", self.load_graph),
+            ("Cancel Loading", self.cancel_loading),
             ("Save Graph to File", self.save_graph),
             ("Add Node", self.add_node_interface),
             ("Delete Node", self.delete_selected_node),
             ("Add Segment", self.add_segment_interface),
             ("Delete Segment", self.delete_segment_interface),
-            ("Show Node Neighbors", self.show_node_neighbors)
+            ("Show Node Neighbors", self.show_node_neighbors),
+            ("Show Reachable Nodes", self.show_reachable)
         ]
 
         for text, command in buttons:
@@ -53,37 +71,33 @@ class GraphInterface:
         tk.Label(self.controls_frame, text="Node Selection",
                  font=("Arial", 12, "bold")).pack(pady=(20, 5))
 
-        self.node_listbox_frame = tk.Frame(self.controls_frame)
-        self.node_listbox_frame.pack(fill=tk.X, pady=5)
-
-        self.node_listbox = tk.Listbox(self.node_listbox_frame, height=10)
-        self.node_listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-
-        node_scrollbar = tk.Scrollbar(self.node_listbox_frame)
-        node_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        self.node_listbox.config(yscrollcommand=node_scrollbar.set)
-        node_scrollbar.config(command=self.node_listbox.yview)
+        # Solo se crean las filas visibles; el cuadro de texto filtra por prefijo
+        self.node_list = VirtualList(self.controls_frame, height=10)
+        self.node_list.pack(fill=tk.X, pady=5)
 
         # Lista de segmentos
         tk.Label(self.controls_frame, text="Segment Selection",
                  font=("Arial", 12, "bold")).pack(pady=(20, 5))
 
-        self.segment_listbox_frame = tk.Frame(self.controls_frame)
-        self.segment_listbox_frame.pack(fill=tk.X, pady=5)
+        self.segment_list = VirtualList(self.controls_frame, height=10)
+        self.segment_list.pack(fill=tk.X, pady=5)
 
-        self.segment_listbox = tk.Listbox(self.segment_listbox_frame, height=10)
-        self.segment_listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-
-        segment_scrollbar = tk.Scrollbar(self.segment_listbox_frame)
-        segment_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        self.segment_listbox.config(yscrollcommand=segment_scrollbar.set)
-        segment_scrollbar.config(command=self.segment_listbox.yview)
+        # Medición de tiempos: al activarla, la barra de estado muestra lo que tardó la última operación
+        self.timings_enabled = tk.BooleanVar(value=False)
+        self.timing_mark = 0  # Llamadas ya mostradas en la barra de estado
+        tk.Checkbutton(self.controls_frame, text="Show Timings", variable=self.timings_enabled,
+                       command=self.toggle_timings).pack(pady=5)
 
         # Barra de estado
+        status_frame = tk.Frame(self.root, bd=1, relief=tk.SUNKEN)
+        status_frame.pack(side=tk.BOTTOM, fill=tk.X)
         self.status_var = tk.StringVar()
         self.status_var.set("Ready")
-        tk.Label(self.root, textvariable=self.status_var, bd=1,
-                 relief=tk.SUNKEN, anchor=tk.W).pack(side=tk.BOTTOM, fill=tk.X)
+        tk.Label(status_frame, textvariable=self.status_var, anchor=tk.W).pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self.timing_var = tk.StringVar()
+        tk.Label(status_frame, textvariable=self.timing_var, anchor=tk.E).pack(side=tk.RIGHT)
+        # Cada mensaje de estado nuevo viene después de una operación, así que se actualiza también el tiempo
+        self.status_var.trace_add("write", lambda *args: self.show_timings())
 
     def setup_figure(self):
         self.fig = Figure(figsize=(6, 5), dpi=100)
@@ -93,44 +107,43 @@ class GraphInterface:
         self.canvas.draw()
         self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
 
+        # Guarda qué artistas dibujan cada nodo y segmento para actualizar solo los afectados
+        self.view = GraphView(self.ax, self.canvas)
+
         self.canvas.mpl_connect("button_press_event", self.on_canvas_click)
+        # Selección por rectángulo arrastrando con el botón derecho
+        self.band_start = None
+        self.band_end = None
+        self.band = None
+        self.canvas.mpl_connect("motion_notify_event", self.on_canvas_drag)
+        self.canvas.mpl_connect("button_release_event", self.on_canvas_release)
+
+    def toggle_timings(self):
+        if self.timings_enabled.get():
+            instrument.Reset()
+            self.timing_mark = 0
+            instrument.Enable()
+        else:
+            instrument.Disable()
+        self.show_timings()
+
+    def show_timings(self):
+        # Muestra la llamada más lenta desde el mensaje de estado anterior
+        self.timing_mark, operations = instrument.RecentOperations(self.timing_mark)
+        if not self.timings_enabled.get():
+            self.timing_var.set("")
+        elif operations:
+            self.timing_var.set(instrument.FormatOperation(max(operations, key=lambda o: o[1])))
 
     def update_node_listbox(self):
-        self.node_listbox.delete(0, tk.END)
-        for node in self.graph.nodes:
-            self.node_listbox.insert(tk.END, node.name)
+        self.node_list.SetItems(self.graph.node_index)
 
     def update_segment_listbox(self):
-        self.segment_listbox.delete(0, tk.END)
-        for segment in self.graph.segments:
-            self.segment_listbox.insert(tk.END, segment.id)
+        self.segment_list.SetItems(self.graph.segment_index)
 
     def plot_full_graph(self):
-        self.ax.clear()
-
-        # Dibujar segmentos
-        for segment in self.graph.segments:
-            self.ax.plot([segment.origin.x, segment.destination.x],
-                         [segment.origin.y, segment.destination.y], 'blue')
-
-            # Flecha y costo
-            midpoint_x = (segment.origin.x + segment.destination.x) / 2
-            midpoint_y = (segment.origin.y + segment.destination.y) / 2
-            self.ax.text(midpoint_x, midpoint_y, round(segment.cost, 2))
-
-            self.ax.arrow(segment.origin.x, segment.origin.y,
-                          segment.destination.x - segment.origin.x,
-                          segment.destination.y - segment.origin.y,
-                          head_width=0.5, head_length=0.5, fc='blue', ec='blue',
-                          length_includes_head=True)
-
-        # Dibujar nodos
-        for node in self.graph.nodes:
-            self.ax.plot(node.x, node.y, 'ko', markersize=5)
-            self.ax.text(node.x, node.y, node.name,
-                         horizontalalignment='left',
-                         verticalalignment='bottom',
-                         color='red', fontsize=7)
+        # Dibujar segmentos, flechas y nodos como colecciones (las etiquetas se omiten en grafos grandes)
+        self.view.Draw(self.graph)
 
         self.ax.set_xlabel('X')
         self.ax.set_ylabel('Y')
@@ -144,6 +157,7 @@ class GraphInterface:
             return False
 
         self.ax.clear()
+        self.view.current = False  # La vista completa se vuelve a dibujar en la próxima modificación
 
         # Dibujar todos los nodos
         for node in self.graph.nodes:
@@ -154,22 +168,19 @@ class GraphInterface:
                          color='red')
 
         # Resaltar vecinos
-        for neighbor in target_node.neighbors:
-            for segment in self.graph.segments:
-                if (segment.origin == target_node and segment.destination == neighbor) or \
-                        (segment.origin == neighbor and segment.destination == target_node):
-                    self.ax.plot([segment.origin.x, segment.destination.x],
-                                 [segment.origin.y, segment.destination.y], 'blue')
-
-                    self.ax.arrow(segment.origin.x, segment.origin.y,
-                                  segment.destination.x - segment.origin.x,
-                                  segment.destination.y - segment.origin.y,
-                                  head_width=0.5, head_length=0.5, fc='blue', ec='blue',
-                                  length_includes_head=True)
-
-                    midpoint_x = (segment.origin.x + segment.destination.x) / 2
-                    midpoint_y = (segment.origin.y + segment.destination.y) / 2
-                    self.ax.text(midpoint_x, midpoint_y, round(segment.cost, 2))
+        for segment in self.graph.GetNeighborSegments(node_name):
+            self.ax.plot([segment.origin.x, segment.destination.x],
+                         [segment.origin.y, segment.destination.y], 'blue')
+
+            self.ax.arrow(segment.origin.x, segment.origin.y,
+                          segment.destination.x - segment.origin.x,
+                          segment.destination.y - segment.origin.y,
+                          head_width=0.5, head_length=0.5, fc='blue', ec='blue',
+                          length_includes_head=True)
+
+            midpoint_x = (segment.origin.x + segment.destination.x) / 2
+            midpoint_y = (segment.origin.y + segment.destination.y) / 2
+            self.ax.text(midpoint_x, midpoint_y, round(segment.cost, 2))
 
         self.ax.set_title(f"Neighbors of node '{node_name}'")
         self.ax.grid(True)
@@ -258,24 +269,107 @@ class GraphInterface:
         self.status_var.set("Empty graph created")
 
     def load_graph(self):
+        if self.loader is not None:
+            messagebox.showwarning("Warning", "A graph is already being loaded")
+            return
+
         file_path = filedialog.askopenfilename(
-            filetypes=[("Text files", "*.txt"), ("All files", "*.*")])
+            filetypes=[("Text files", "*.txt"), ("Binary graph files", "*.bin"), ("All files", "*.*")])
 
         if file_path:
-            self.graph = LoadGraphFromFile(file_path)
-            self.update_node_listbox()
-            self.update_segment_listbox()
-            self.plot_full_graph()
+            self.start_loading(file_path)
+
+    def start_loading(self, file_path):
+        # Lee el fichero en un hilo aparte para que la ventana siga respondiendo durante la carga
+        try:
+            size = max(os.path.getsize(file_path), 1)
+        except OSError as e:
+            messagebox.showerror("Error", f"Failed to load {file_path}: {e}")
+            return
+        self.load_cancel = threading.Event()
+        self.load_messages = queue.Queue()
+        self.loader = threading.Thread(target=self.load_worker, args=(file_path,), daemon=True)
+        self.loader.start()
+        self.status_var.set(f"Loading {file_path}...")
+        self.root.after(100, self.poll_loading, file_path, size)
+
+    def load_worker(self, file_path):
+        # Se ejecuta en el hilo de carga: nunca toca los widgets de Tk, solo envía mensajes por la cola
+        def progress(report, position):
+            self.load_messages.put(("progress", report.lines, position))
+            return not self.load_cancel.is_set()
+
+        try:
+            if file_path.endswith(".bin"):
+                graph, report = LoadGraphFromBinary(file_path), None
+                if graph is None:
+                    raise ValueError("not a readable binary graph file")
+            else:
+                graph, report = StreamGraphFromFile(file_path, progress=progress)
+            self.load_messages.put(("done", graph, report))
+        except (OSError, UnicodeDecodeError, ValueError) as e:
+            self.load_messages.put(("error", str(e), None))
+
+    def poll_loading(self, file_path, size):
+        # Se ejecuta en el hilo de Tk cada 100 ms mientras dura la carga
+        while True:
+            try:
+                kind, first, second = self.load_messages.get_nowait()
+            except queue.Empty:
+                break
+
+            if kind == "progress":
+                if not self.load_cancel.is_set():
+                    self.status_var.set(f"Loading {file_path}: {first} lines ({100 * second // size}%)"
+                                        " - press Cancel Loading to stop")
+                continue
+
+            self.loader = None
+            if kind == "error":
+                self.status_var.set("Ready")
+                messagebox.showerror("Error", f"Failed to load {file_path}: {first}")
+            elif self.load_cancel.is_set():
+                self.status_var.set(f"Loading of {file_path} cancelled")
+            else:
+                self.show_loaded_graph(file_path, first, second)
+            return
+
+        self.root.after(100, self.poll_loading, file_path, size)
+
+    def show_loaded_graph(self, file_path, graph, report):
+        # Sustituye el grafo actual por el que se acaba de cargar
+        self.graph = graph
+        self.update_node_listbox()
+        self.update_segment_listbox()
+        self.plot_full_graph()
+        if report is not None and report.error_count:
+            first_line = report.errors[0][0]
+            self.status_var.set(f"Graph loaded from {file_path} ({report.error_count} malformed lines skipped,"
+                                f" first at line {first_line})")
+        else:
             self.status_var.set(f"Graph loaded from {file_path}")
 
+    def cancel_loading(self):
+        if self.loader is None:
+            self.status_var.set("No graph is being loaded")
+            return
+        self.load_cancel.set()
+        self.status_var.set("Cancelling...")
+
     def save_graph(self):
         file_path = filedialog.asksaveasfilename(
             defaultextension=".txt",
-            filetypes=[("Text files", "*.txt"), ("All files", "*.*")])
+            filetypes=[("Text files", "*.txt"), ("Binary graph files", "*.bin"), ("All files", "*.*")])
 
         if file_path:
-            SaveGraphToFile(self.graph, file_path)
-            self.status_var.set(f"Graph saved to {file_path}")
+            if file_path.endswith(".bin"):
+                saved = SaveGraphToBinary(self.graph, file_path)
+            else:
+                saved = SaveGraphToFile(self.graph, file_path)
+            if saved:
+                self.status_var.set(f"Graph saved to {file_path}")
+            else:
+                messagebox.showerror("Error", f"Failed to save {file_path}")
 
     def add_node_interface(self):
         name = simpledialog.askstring("Node Name", "Enter node name:")
@@ -292,22 +386,27 @@ class GraphInterface:
         if x is None or y is None:
             return
 
-        AddNode(self.graph, Node(name, x, y))
-        self.update_node_listbox()
-        self.plot_full_graph()
+        node = Node(name, x, y)
+        AddNode(self.graph, node)
+        self.node_list.Insert(name)
+        self.show_added_node(node)
         self.status_var.set(f"Node {name} added at ({x}, {y})")
 
     def delete_selected_node(self):
-        selection = self.node_listbox.curselection()
-        if not selection:
+        node_name = self.node_list.GetSelected()
+        if node_name is None:
             messagebox.showwarning("Warning", "No node selected")
             return
 
-        node_name = self.node_listbox.get(selection[0])
+        node = self.graph.GetNodeByName(node_name)
+        touching = self.graph.GetTouchingSegments(node_name)
         if DeleteNode(self.graph, node_name):
-            self.update_node_listbox()
-            self.update_segment_listbox()
-            self.plot_full_graph()
+            self.node_list.Delete(node_name)
+            for segment in touching:
+                self.segment_list.Delete(segment.id)
+            self.view.ClearHighlight(redraw=False)
+            if not self.view.RemoveNode(node, touching):
+                self.plot_full_graph()
             self.status_var.set(f"Node {node_name} deleted")
         else:
             messagebox.showerror("Error", "Failed to delete node")
@@ -324,51 +423,143 @@ class GraphInterface:
             seg_id = f"{origin}-{dest}"
 
         try:
-            AddSegment(self.graph, seg_id, origin, dest)
-            self.update_segment_listbox()
-            self.plot_full_graph()
+            if not AddSegment(self.graph, seg_id, origin, dest):
+                messagebox.showerror("Error", "Unknown node or segment ID already exists")
+                return
+            self.segment_list.Insert(seg_id)
+            if not self.view.AddSegment(self.graph.GetSegmentById(seg_id)):
+                self.plot_full_graph()
             self.status_var.set(f"Segment {seg_id} added")
         except Exception as e:
             messagebox.showerror("Error", f"Failed to add segment: {str(e)}")
 
     def delete_segment_interface(self):
-        selection = self.segment_listbox.curselection()
-        if not selection:
+        seg_id = self.segment_list.GetSelected()
+        if seg_id is None:
             messagebox.showwarning("Warning", "No segment selected")
             return
 
-        seg_id = self.segment_listbox.get(selection[0])
+        segment = self.graph.GetSegmentById(seg_id)
         if DeleteSegment(self.graph, seg_id):
-            self.update_segment_listbox()
-            self.plot_full_graph()
+            self.segment_list.Delete(seg_id)
+            self.view.ClearHighlight(redraw=False)
+            if not self.view.RemoveSegment(segment):
+                self.plot_full_graph()
             self.status_var.set(f"Segment {seg_id} deleted")
         else:
             messagebox.showerror("Error", "Failed to delete segment")
 
     def show_node_neighbors(self):
-        selection = self.node_listbox.curselection()
-        if not selection:
+        node_name = self.node_list.GetSelected()
+        if node_name is None:
             messagebox.showwarning("Warning", "No node selected")
             return
 
-        node_name = self.node_listbox.get(selection[0])
         if self.plot_single_node_view(node_name):
             self.status_var.set(f"Showing neighbors of {node_name}")
         else:
             messagebox.showerror("Error", "Node not found")
 
+    def show_reachable(self):
+        # Isócrona: nodos alcanzables desde uno o varios orígenes sin pasar de un coste máximo
+        selected = self.node_list.GetSelected()
+        text = simpledialog.askstring("Reachable Nodes", "Origin nodes (comma separated):",
+                                      initialvalue=selected or "")
+        if not text:
+            return
+        origins = [name.strip() for name in text.split(',') if name.strip()]
+        unknown = [name for name in origins if self.graph.GetNodeByName(name) is None]
+        if unknown:
+            messagebox.showerror("Error", f"Node not found: {', '.join(unknown)}")
+            return
+        budget = simpledialog.askfloat("Reachable Nodes", "Maximum cost:", minvalue=0)
+        if budget is None:
+            return
+
+        reached = ReachableWithin(self.graph, origins, budget)
+        # Segmentos recorridos dentro del presupuesto, resaltados junto con los nodos en un solo dibujo
+        segments = [segment for name, cost in reached.items() for segment in self.graph.GetOutgoingSegments(name)
+                    if cost + segment.cost <= budget]
+        if not self.view.current:
+            self.plot_full_graph()
+        self.view.Highlight(self.graph, reached, segments)
+        self.status_var.set(f"{len(reached)} nodes reachable from {', '.join(origins)} within {budget:g}")
+
+    def show_added_node(self, node):
+        # Dibuja solo el nodo nuevo; si la vista no está al día se redibuja el grafo completo
+        if not self.view.AddNode(node):
+            self.plot_full_graph()
+
+    def click_tolerance(self):
+        # Distancia en unidades del gráfico que corresponde a CLICK_PIXELS píxeles
+        xlim = self.ax.get_xlim()
+        return CLICK_PIXELS * abs(xlim[1] - xlim[0]) / max(self.ax.bbox.width, 1)
+
+    def highlight_selection(self, node_names, segments):
+        # Resalta los nodos y segmentos seleccionados en un solo dibujo
+        if not self.view.current:
+            self.plot_full_graph()
+        self.view.Highlight(self.graph, dict.fromkeys(node_names, 0.0), segments)
+
+    def select_at(self, x, y):
+        # Selecciona el nodo o, si no hay ninguno cerca, el segmento más cercano al punto; devuelve False si no hay nada
+        tolerance = self.click_tolerance()
+        node = GetClosest(self.graph, x, y)
+        if node is not None and math.hypot(node.x - x, node.y - y) <= tolerance:
+            self.node_list.Select(node.name)
+            self.highlight_selection([node.name], [])
+            self.status_var.set(f"Node {node.name} selected")
+            return True
+        segment = GetClosestSegment(self.graph, x, y)
+        if segment is not None and SegmentDistance(segment, x, y) <= tolerance:
+            self.segment_list.Select(segment.id)
+            self.highlight_selection([], [segment])
+            self.status_var.set(f"Segment {segment.id} selected")
+            return True
+        return False
+
+    def on_canvas_drag(self, event):
+        if self.band is not None and event.inaxes:
+            (x0, y0), (x1, y1) = self.band_start, (event.xdata, event.ydata)
+            self.band_end = (x1, y1)
+            self.band.set_bounds(min(x0, x1), min(y0, y1), abs(x1 - x0), abs(y1 - y0))
+            self.canvas.draw_idle()
+
+    def on_canvas_release(self, event):
+        if self.band is None:
+            return
+        # Si se suelta fuera del gráfico se usa la última esquina dibujada
+        x0, y0 = self.band_start
+        x1, y1 = (event.xdata, event.ydata) if event.inaxes else self.band_end
+        self.band.remove()
+        self.band = None
+
+        nodes = GetNodesInRectangle(self.graph, x0, y0, x1, y1)
+        segments = GetSegmentsInRectangle(self.graph, x0, y0, x1, y1)
+        if len(nodes) == 1:
+            self.node_list.Select(nodes[0].name)
+        self.highlight_selection([node.name for node in nodes], segments)
+        self.status_var.set(f"{len(nodes)} nodes and {len(segments)} segments selected")
+
     def on_canvas_click(self, event):
-        if event.inaxes:
+        if event.inaxes and event.button == 3:
+            self.band_start = self.band_end = (event.xdata, event.ydata)
+            self.band = Rectangle(self.band_start, 0, 0, fill=False, linestyle='--', edgecolor='gray', zorder=6)
+            self.ax.add_patch(self.band)
+        elif event.inaxes and event.button == 1:
             x, y = event.xdata, event.ydata
+            if self.select_at(x, y):
+                return
             name = simpledialog.askstring("Node Name", "Enter node name:")
             if name:
                 if self.graph.GetNodeByName(name):
                     messagebox.showerror("Error", "Node name already exists")
                     return
 
-                AddNode(self.graph, Node(name, x, y))
-                self.update_node_listbox()
-                self.plot_full_graph()
+                node = Node(name, x, y)
+                AddNode(self.graph, node)
+                self.node_list.Insert(name)
+                self.show_added_node(node)
                 self.status_var.set(f"Node {name} added at ({x:.2f}, {y:.2f})")
 
 
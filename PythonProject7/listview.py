@@ -0,0 +1,185 @@
+import bisect
+import tkinter as tk
+# `bisect` keeps the names sorted and finds the rows matching a prefix by binary search.
+# `tkinter` provides the Listbox, Scrollbar and Entry the virtual list is made of.
+
+
+class SortedNames:
+    # This class represents a sorted list of names that can be narrowed to the names starting with a prefix.
+    # Inserting or deleting a name costs a binary search plus one list shift, and the rows matching a prefix
+    # are always a contiguous range of the list, found with two binary searches.
+    def __init__(self, names=()):
+        self.names = sorted(str(name) for name in names)
+        self.prefix = ''
+        self.start, self.end = 0, len(self.names)  # Range of the names matching the prefix.
+
+    def __len__(self):
+        # Number of names matching the current prefix.
+        return self.end - self.start
+
+    def __getitem__(self, i):
+        # Returns the i-th name matching the current prefix.
+        if not 0 <= i < len(self):
+            raise IndexError("row out of range")
+        return self.names[self.start + i]
+
+    def SetPrefix(self, prefix):
+        # Keeps only the names that start with 'prefix' ('' keeps all of them).
+        self.prefix = prefix
+        self.start = bisect.bisect_left(self.names, prefix)
+        # Every name starting with 'prefix' sorts before 'prefix' followed by the largest code point.
+        self.end = bisect.bisect_left(self.names, prefix + '\U0010ffff') if prefix else len(self.names)
+
+    def Insert(self, name):
+        # Adds a name in its sorted position. Returns its row among the names matching the prefix, or None.
+        name = str(name)
+        position = bisect.bisect_left(self.names, name)
+        self.names.insert(position, name)
+        self.SetPrefix(self.prefix)
+        if name.startswith(self.prefix):
+            return position - self.start
+        return None
+
+    def Delete(self, name):
+        # Removes a name. Returns False if it is not in the list.
+        name = str(name)
+        position = bisect.bisect_left(self.names, name)
+        if position == len(self.names) or self.names[position] != name:
+            return False
+        del self.names[position]
+        self.SetPrefix(self.prefix)
+        return True
+
+    def RowOf(self, name):
+        # Returns the row of 'name' among the names matching the prefix, or None if it is not there.
+        name = str(name)
+        position = bisect.bisect_left(self.names, name, self.start, self.end)
+        if position < self.end and self.names[position] == name:
+            return position - self.start
+        return None
+
+
+class VirtualList(tk.Frame):
+    # This class represents a list of names for very large graphs. The Listbox only ever holds the rows that fit on
+    # screen: scrolling replaces those few rows instead of Tk keeping one entry per name.
+    # A filter box above the list keeps only the names starting with what has been typed.
+    def __init__(self, master, height=10, on_select=None):
+        super().__init__(master)
+        self.height = height
+        self.on_select = on_select  # Called with the selected name when the selection changes.
+        self.names = SortedNames()
+        self.first = 0  # Row shown at the top of the Listbox.
+        self.selected = None
+
+        self.filter_var = tk.StringVar()
+        self.filter_var.trace_add("write", lambda *args: self.SetFilter(self.filter_var.get()))
+        tk.Entry(self, textvariable=self.filter_var).pack(side=tk.TOP, fill=tk.X)
+
+        self.listbox = tk.Listbox(self, height=height, exportselection=False)
+        self.listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scrollbar = tk.Scrollbar(self, command=self.OnScrollbar)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        self.listbox.bind("<<ListboxSelect>>", self.OnSelect)
+        self.listbox.bind("<MouseWheel>", lambda event: self.ScrollBy(-1 if event.delta > 0 else 1))
+        self.listbox.bind("<Button-4>", lambda event: self.ScrollBy(-1))
+        self.listbox.bind("<Button-5>", lambda event: self.ScrollBy(1))
+        self.listbox.bind("<Up>", lambda event: self.MoveSelection(-1))
+        self.listbox.bind("<Down>", lambda event: self.MoveSelection(1))
+
+    def SetItems(self, names):
+        # Replaces all the names of the list. The filter and, if it still exists, the selection are kept.
+        self.names = SortedNames(names)
+        self.names.SetPrefix(self.filter_var.get())
+        if self.selected is not None and self.names.RowOf(self.selected) is None:
+            self.selected = None
+        self.Render()
+
+    def Insert(self, name):
+        # Adds one name to the list.
+        row = self.names.Insert(name)
+        if row is not None and row < self.first + self.height:
+            self.Render()
+        else:
+            self.UpdateScrollbar()
+
+    def Delete(self, name):
+        # Removes one name from the list.
+        if not self.names.Delete(name):
+            return
+        if str(name) == self.selected:
+            self.selected = None
+        self.Render()
+
+    def GetSelected(self):
+        # Returns the selected name, or None if there is no selection.
+        return self.selected
+
+    def SetFilter(self, prefix):
+        # Shows only the names starting with 'prefix' and goes back to the top of the list.
+        self.names.SetPrefix(prefix)
+        self.first = 0
+        self.Render()
+
+    def ScrollTo(self, first):
+        # Shows the rows starting at 'first', clamped so the last page is full.
+        self.first = max(0, min(first, len(self.names) - self.height))
+        self.Render()
+
+    def ScrollBy(self, rows):
+        self.ScrollTo(self.first + rows)
+        return "break"
+
+    def OnScrollbar(self, *args):
+        # Translates the Scrollbar commands ('moveto', fraction) and ('scroll', n, 'units' or 'pages').
+        if args[0] == 'moveto':
+            self.ScrollTo(int(float(args[1]) * len(self.names)))
+        elif args[0] == 'scroll':
+            step = self.height if args[2] == 'pages' else 1
+            self.ScrollBy(int(args[1]) * step)
+
+    def MoveSelection(self, step):
+        # Moves the selection one row up or down, scrolling when it leaves the visible rows.
+        if not len(self.names):
+            return "break"
+        row = self.names.RowOf(self.selected) if self.selected is not None else None
+        row = 0 if row is None else max(0, min(row + step, len(self.names) - 1))
+        self.Select(self.names[row])
+        return "break"
+
+    def Select(self, name):
+        # Selects 'name' and scrolls so it is visible.
+        row = self.names.RowOf(name)
+        if row is None:
+            return
+        self.selected = str(name)
+        if not self.first <= row < self.first + self.height:
+            self.first = max(0, min(row - self.height // 2, len(self.names) - self.height))
+        self.Render()
+        if self.on_select is not None:
+            self.on_select(self.selected)
+
+    def OnSelect(self, event):
+        selection = self.listbox.curselection()
+        if selection:
+            self.selected = self.listbox.get(selection[0])
+            if self.on_select is not None:
+                self.on_select(self.selected)
+
+    def Render(self):
+        # Puts the visible rows into the Listbox. Costs O(height) whatever the number of names.
+        self.first = max(0, min(self.first, len(self.names) - self.height))
+        end = min(self.first + self.height, len(self.names))
+        self.listbox.delete(0, tk.END)
+        self.listbox.insert(tk.END, *(self.names[i] for i in range(self.first, end)))
+        row = self.names.RowOf(self.selected) if self.selected is not None else None
+        if row is not None and self.first <= row < end:
+            self.listbox.selection_set(row - self.first)
+        self.UpdateScrollbar()
+
+    def UpdateScrollbar(self):
+        total = len(self.names)
+        if total <= self.height:
+            self.scrollbar.set(0.0, 1.0)
+        else:
+            self.scrollbar.set(self.first / total, (self.first + self.height) / total)
@@ -3,30 +3,56 @@ import math
 
 
 class Node:
-   # This class represents a node with a name, coordinates (x and y), and a list of neighbors.
+   # This class represents a node with a name, coordinates (x and y), and its neighbors.
+   # __slots__ stores the attributes in fixed fields instead of a per-instance __dict__, which saves memory on large graphs.
+   __slots__ = ('name', 'x', 'y', 'neighbors')
+
    def __init__(self, name, x, y):
        # Initializes the attributes of the Node class.
        # name: A string representing the name of the node.
        # x, y: Floats representing the coordinates of the node.
-       # neighbors: An empty list initialized to store neighboring nodes.
+       # neighbors: An empty dictionary that maps each neighboring node to the number of segments towards it.
+       # Iterating over it gives the neighbors in the order they were added, and membership checks and removals are O(1).
        self.name = name
        self.x = x
        self.y = y
-       self.neighbors = []
+       self.neighbors = {}
 
 
 def AddNeighbor(n1, n2):
-   # Adds node 'n2' to the list of neighbors of node 'n1'.
-   # Returns False if 'n2' is already in the neighbors list, avoiding duplicate entries.
+   # Adds node 'n2' to the neighbors of node 'n1'.
+   # Returns False if 'n2' is already a neighbor, avoiding duplicate entries.
    # Returns True if 'n2' was successfully added as a neighbor.
-   if n2 in n1.neighbors:  # Checks if 'n2' is already in 'n1's neighbor list.
+   if n2 in n1.neighbors:  # Checks if 'n2' is already one of 'n1's neighbors.
        return False  # If it is, no action is taken, and False is returned.
    else:
-       n1.neighbors.append(n2)  # Adds 'n2' to 'n1's neighbors list.
+       n1.neighbors[n2] = 1  # Adds 'n2' to 'n1's neighbors.
        return True  # Returns True to indicate the operation was successful.
 
 
+def LinkNeighbor(n1, n2):
+   # Records one more segment from 'n1' to 'n2', adding 'n2' as a neighbor if needed.
+   n1.neighbors[n2] = n1.neighbors.get(n2, 0) + 1
+
+
+def UnlinkNeighbor(n1, n2):
+   # Records that one segment from 'n1' to 'n2' was removed. 'n2' stops being a neighbor
+   # when no segment from 'n1' to it is left. Returns False if 'n2' was not a neighbor.
+   count = n1.neighbors.get(n2)
+   if count is None:
+       return False
+   if count > 1:
+       n1.neighbors[n2] = count - 1
+   else:
+       del n1.neighbors[n2]
+   return True
+
+
 def Distance(n1, n2):
    # Calculates the Euclidean distance between two nodes, 'n1' and 'n2'.
    # Formula: sqrt((x2 - x1)^2 + (y2 - y1)^2), which measures the straight-line distance between two points in 2D space.
-   return math.sqrt((n1.x - n2.x) ** 2 + (n1.y - n2.y) ** 2)
+   # The squares are plain multiplications, which round exactly like the vectorized ComputeCosts in segment.py
+   # (x ** 2 goes through pow, which can be one unit in the last place off).
+   dx = n1.x - n2.x
+   dy = n1.y - n2.y
+   return math.sqrt(dx * dx + dy * dy)
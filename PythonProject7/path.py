@@ -0,0 +1,253 @@
+import heapq
+import math
+from node import Node, Distance
+from snapshot import GraphSnapshot
+# `heapq` provides the binary heap used as the priority queue of the searches.
+# `Distance` is the straight-line distance between two nodes, used as the A* heuristic.
+# Searches also run directly on a `GraphSnapshot` built with Graph.Freeze().
+
+
+class Path:
+    # This class represents a route through the graph.
+    def __init__(self):
+        # nodes: the Node objects visited, from the origin to the destination.
+        # segment_ids: the ids of the segments followed, one less than the number of nodes.
+        # cost: the sum of the costs of the segments followed.
+        # expanded: how many nodes the search settled before reaching the destination.
+        self.nodes = []
+        self.segment_ids = []
+        self.cost = 0.0
+        self.expanded = 0
+
+    def GetNodeNames(self):
+        # Returns the names of the nodes of the path, in order.
+        return [node.name for node in self.nodes]
+
+
+def FindPath(g, origin_name, destination_name, heuristic=None):
+    # Finds the cheapest route from 'origin_name' to 'destination_name' following the directed segments of 'g'.
+    # Nodes are settled in order of cost so far plus 'heuristic(node, destination)'; without a heuristic
+    # this is Dijkstra's algorithm. Returns a Path, or None if a node is unknown or the destination is unreachable.
+    # 'g' may also be a GraphSnapshot, in which case the search runs over its arrays.
+    # On a Graph the result is kept in its query cache until the graph changes, so the same Path object is returned
+    # for repeated queries and must not be modified. Without a heuristic, the contraction hierarchy attached to the
+    # graph by PrepareHierarchy answers the query, unless the graph has changed since (see hierarchy.py).
+    if isinstance(g, GraphSnapshot):
+        return FindPathOnSnapshot(g, origin_name, destination_name, heuristic is not None)
+    if heuristic is None and g.hierarchy is not None and not g.hierarchy.IsStale(g):
+        search = lambda: g.hierarchy.FindPath(origin_name, destination_name, g)
+    else:
+        search = lambda: SearchPath(g, origin_name, destination_name, heuristic)
+    return g.cache.Lookup(('path', origin_name, destination_name, heuristic), g.version, search)
+
+
+def SearchPath(g, origin_name, destination_name, heuristic=None):
+    # Runs the search of FindPath on a Graph, without the cache.
+    origin = g.GetNodeByName(origin_name)
+    destination = g.GetNodeByName(destination_name)
+    if origin is None or destination is None:
+        return None
+
+    best = {origin_name: 0.0}  # Cheapest known cost to reach each node.
+    previous = {origin_name: None}  # Segment used to reach each node on its cheapest known route.
+    settled = set()
+    counter = 0  # Breaks ties in the heap so nodes never have to be compared.
+    start = heuristic(origin, destination) if heuristic else 0.0
+    heap = [(start, counter, origin_name)]
+    while heap:
+        _, _, name = heapq.heappop(heap)
+        if name in settled:
+            continue  # Stale entry left behind by a later improvement.
+        settled.add(name)
+        if name == destination_name:
+            break
+        cost = best[name]
+        for segment in g.GetOutgoingSegments(name):
+            next_name = segment.destination.name
+            new_cost = cost + segment.cost
+            if next_name not in settled and new_cost < best.get(next_name, float('inf')):
+                best[next_name] = new_cost
+                previous[next_name] = segment
+                counter += 1
+                priority = new_cost + heuristic(segment.destination, destination) if heuristic else new_cost
+                heapq.heappush(heap, (priority, counter, next_name))
+    else:
+        return None
+
+    path = Path()
+    path.cost = best[destination_name]
+    path.expanded = len(settled)
+    segment = previous[destination_name]
+    path.nodes.append(destination)
+    while segment is not None:
+        path.segment_ids.append(segment.id)
+        path.nodes.append(segment.origin)
+        segment = previous[segment.origin.name]
+    path.nodes.reverse()
+    path.segment_ids.reverse()
+    return path
+
+
+def FindPathOnSnapshot(s, origin_name, destination_name, use_heuristic=False):
+    # Same search as FindPath over the CSR arrays of the snapshot 's'. With 'use_heuristic' the
+    # straight-line distance to the destination is used as in A*.
+    # The nodes of the returned Path are new Node objects holding the name and coordinates stored in the snapshot.
+    origin = s.IndexOf(origin_name)
+    destination = s.IndexOf(destination_name)
+    if origin is None or destination is None:
+        return None
+
+    xs, ys = s.xs, s.ys
+    offsets, targets, costs = s.offsets, s.targets, s.costs
+    tx, ty = xs[destination], ys[destination]
+    best = [math.inf] * len(s)
+    previous = [-1] * len(s)  # Edge position used to reach each node, -1 for the origin.
+    previous_node = [-1] * len(s)  # Node that edge starts at.
+    settled = bytearray(len(s))
+    expanded = 0
+    best[origin] = 0.0
+    start = math.hypot(xs[origin] - tx, ys[origin] - ty) if use_heuristic else 0.0
+    heap = [(start, origin)]
+    while heap:
+        _, i = heapq.heappop(heap)
+        if settled[i]:
+            continue
+        settled[i] = 1
+        expanded += 1
+        if i == destination:
+            break
+        cost = best[i]
+        for e in range(offsets[i], offsets[i + 1]):
+            j = targets[e]
+            new_cost = cost + costs[e]
+            if new_cost < best[j] and not settled[j]:
+                best[j] = new_cost
+                previous[j] = e
+                previous_node[j] = i
+                if use_heuristic:
+                    heapq.heappush(heap, (new_cost + math.hypot(xs[j] - tx, ys[j] - ty), j))
+                else:
+                    heapq.heappush(heap, (new_cost, j))
+    else:
+        return None
+
+    path = Path()
+    path.cost = best[destination]
+    path.expanded = expanded
+    order = [destination]
+    i = destination
+    while previous[i] != -1:
+        e = previous[i]
+        path.segment_ids.append(s.segment_ids[e])
+        i = previous_node[i]
+        order.append(i)
+    order.reverse()
+    path.segment_ids.reverse()
+    path.nodes = [Node(s.names[i], xs[i], ys[i]) for i in order]
+    return path
+
+
+def CostsFromOrigin(s, origin_name, destination_names):
+    # Runs one Dijkstra search from 'origin_name' over the snapshot 's' and returns a dictionary with the cost of the
+    # cheapest route to each of the 'destination_names' that can be reached. The search stops as soon as every
+    # destination has been settled, so one tree answers all the destinations of the same origin.
+    origin = s.IndexOf(origin_name)
+    if origin is None:
+        return {}
+    wanted = {}  # Node index -> names of the destinations at that node still waiting for their cost.
+    for name in destination_names:
+        i = s.IndexOf(name)
+        if i is not None:
+            wanted.setdefault(i, []).append(name)
+
+    offsets, targets, costs = s.offsets, s.targets, s.costs
+    best = [math.inf] * len(s)
+    settled = bytearray(len(s))
+    best[origin] = 0.0
+    heap = [(0.0, origin)]
+    found = {}
+    while heap and wanted:
+        cost, i = heapq.heappop(heap)
+        if settled[i]:
+            continue
+        settled[i] = 1
+        for name in wanted.pop(i, ()):
+            found[name] = cost
+        for e in range(offsets[i], offsets[i + 1]):
+            j = targets[e]
+            new_cost = cost + costs[e]
+            if new_cost < best[j] and not settled[j]:
+                best[j] = new_cost
+                heapq.heappush(heap, (new_cost, j))
+    return found
+
+
+def ReachableWithin(g, origin_names, budget):
+    # Returns every node that can be reached from the origins following the directed segments of 'g' with a total
+    # cost of at most 'budget' (an isochrone), as a dictionary from node name to the cost of its cheapest route from
+    # the nearest origin, in increasing order of cost. 'origin_names' is one node name or a list of names; unknown
+    # names are ignored. Nodes are settled in order of cost and nothing over the budget is ever queued, so the search
+    # only visits the nodes inside the isochrone and the segments leaving them.
+    # 'g' may also be a GraphSnapshot. On a Graph the result is cached until the graph changes.
+    if isinstance(origin_names, str):
+        origin_names = [origin_names]
+    origin_names = tuple(origin_names)
+    if isinstance(g, GraphSnapshot):
+        return ReachableOnSnapshot(g, origin_names, budget)
+    return dict(g.cache.Lookup(('reachable', origin_names, budget), g.version,
+                               lambda: SearchReachable(g, origin_names, budget)))
+
+
+def SearchReachable(g, origin_names, budget):
+    # Runs the search of ReachableWithin on a Graph, without the cache.
+    best = {name: 0.0 for name in origin_names if name in g.node_index and budget >= 0}
+    heap = [(0.0, name) for name in best]
+    reached = {}
+    while heap:
+        cost, name = heapq.heappop(heap)
+        if name in reached:
+            continue
+        reached[name] = cost
+        for segment in g.GetOutgoingSegments(name):
+            next_name = segment.destination.name
+            new_cost = cost + segment.cost
+            if new_cost <= budget and next_name not in reached and new_cost < best.get(next_name, math.inf):
+                best[next_name] = new_cost
+                heapq.heappush(heap, (new_cost, next_name))
+    return reached
+
+
+def ReachableOnSnapshot(s, origin_names, budget):
+    # Same search as ReachableWithin over the CSR arrays of the snapshot 's'.
+    offsets, targets, costs = s.offsets, s.targets, s.costs
+    best = {}
+    for name in origin_names:
+        i = s.IndexOf(name)
+        if i is not None and budget >= 0:
+            best[i] = 0.0
+    heap = [(0.0, i) for i in best]
+    reached = {}
+    while heap:
+        cost, i = heapq.heappop(heap)
+        if i in reached:
+            continue
+        reached[i] = cost
+        for e in range(offsets[i], offsets[i + 1]):
+            j = targets[e]
+            new_cost = cost + costs[e]
+            if new_cost <= budget and j not in reached and new_cost < best.get(j, math.inf):
+                best[j] = new_cost
+                heapq.heappush(heap, (new_cost, j))
+    return {s.names[i]: cost for i, cost in reached.items()}
+
+
+def Dijkstra(g, origin_name, destination_name):
+    # Cheapest route between two nodes using Dijkstra's algorithm with a binary heap.
+    return FindPath(g, origin_name, destination_name)
+
+
+def AStar(g, origin_name, destination_name):
+    # Cheapest route between two nodes using A*. The straight-line distance to the destination never
+    # overestimates the remaining cost because segment costs are Euclidean lengths, so the route is still optimal
+    # while far fewer nodes are expanded than with Dijkstra.
+    return FindPath(g, origin_name, destination_name, Distance)
@@ -0,0 +1,95 @@
+import matplotlib.pyplot as plt
+from render import DrawGraph
+from instrument import Instrumented
+# `matplotlib` is used for graphical plotting. This module is only imported when a graph is plotted
+# (see Plot and PlotNode in graph.py), so programs that never plot do not load matplotlib or a GUI backend.
+# `DrawGraph` draws a whole graph with a few matplotlib collections.
+
+
+@Instrumented
+def Plot(g, batched=False):
+    # Plots the entire graph, including nodes, segments, and costs of the segments.
+    # With 'batched' the graph is drawn with DrawGraph: all segments, arrowheads and nodes become three artists
+    # and the labels are left out when too many segments are visible, which keeps large graphs fast to draw.
+    if batched:
+        DrawGraph(plt.gca(), g)
+    else:
+        PlotSegmentsOneByOne(g)
+
+    # Adds labels, title, and grid to the plot.
+    plt.xlabel('X')
+    plt.ylabel('Y')
+    plt.title("Graph with Direction Indicated at Segment End")
+    plt.grid()
+    plt.show()
+
+
+def PlotSegmentsOneByOne(g):
+    # Draws every segment, arrow, cost, node and name of 'g' as separate matplotlib artists.
+    for segment in g.segments:
+        # Draws each segment as a line connecting the origin and destination nodes.
+        plt.plot([segment.origin.x, segment.destination.x],
+                 [segment.origin.y, segment.destination.y], 'blue')
+
+
+        # Calculates the midpoint of the segment to display its cost.
+        midpoint_x = segment.origin.x + (segment.destination.x - segment.origin.x) / 2
+        midpoint_y = segment.origin.y + (segment.destination.y - segment.origin.y) / 2
+        plt.text(midpoint_x, midpoint_y, round(segment.cost, 2))  # Displays the segment cost.
+
+
+        # Adds an arrow to indicate the direction of the segment.
+        plt.arrow(segment.origin.x, segment.origin.y,
+                  segment.destination.x - segment.origin.x,
+                  segment.destination.y - segment.origin.y,
+                  head_width=0.5, head_length=0.5, fc='blue', ec='blue', length_includes_head=True)
+
+
+    # Draws all the nodes in the graph.
+    for node in g.nodes:
+        plt.plot(node.x, node.y, marker='o', linestyle='', color='black', markersize=5)
+        plt.text(node.x, node.y, node.name, horizontalalignment='left', verticalalignment='bottom', color='red',
+                 fontsize=7)
+
+
+@Instrumented
+def PlotNode(g, name):
+    # Plots a single node and its neighbors.
+    target_node = g.GetNodeByName(name)  # Finds the target node by name.
+
+
+    if target_node is None:
+        # If the node doesn't exist, displays a message and returns.
+        print(f"Node '{name}' does not exist in the graph.")
+        return
+
+
+    # Creates a new plot for the target node and its neighbors.
+    plt.figure()
+    for node in g.nodes:
+        plt.plot(node.x, node.y, marker='o', linestyle='', color='black', markersize=5)
+        plt.text(node.x, node.y, node.name, horizontalalignment='left', verticalalignment='bottom', color='red')
+
+
+    for segment in g.GetNeighborSegments(name):
+        # Draws the segment connecting the target node and its neighbor in blue.
+        plt.plot([segment.origin.x, segment.destination.x],
+                 [segment.origin.y, segment.destination.y], 'blue')
+        plt.arrow(segment.origin.x, segment.origin.y,
+                  segment.destination.x - segment.origin.x,
+                  segment.destination.y - segment.origin.y,
+                  head_width=0.5, head_length=0.5, fc='blue', ec='blue', length_includes_head=True)
+
+
+        # Displays the segment cost at the midpoint.
+        midpoint_x = (segment.origin.x + segment.destination.x) / 2
+        midpoint_y = (segment.origin.y + segment.destination.y) / 2
+        plt.text(midpoint_x, midpoint_y, round(segment.cost, 2))
+
+
+    # Adds labels, title, and grid to the plot.
+    plt.xlabel('X')
+    plt.ylabel('Y')
+    plt.title(f"Graph with nodes and segments for node '{name}'")
+    plt.grid()
+    plt.show()
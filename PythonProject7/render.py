@@ -0,0 +1,281 @@
+import numpy
+from matplotlib.collections import LineCollection, PolyCollection
+from matplotlib.colors import to_rgba
+from matplotlib.patches import Polygon
+# `numpy` holds the coordinates of all the segments and nodes so the geometry is computed in one go.
+# `LineCollection` draws every segment and `PolyCollection` every arrowhead as a single matplotlib artist.
+# `to_rgba` and `Polygon` are used by GraphView to hide single rows and to draw items added later.
+
+# Cost and name labels are only drawn while the number of visible segments (or nodes) stays below this limit.
+LABEL_LIMIT = 300
+
+
+def SegmentArrays(segments):
+    # Returns the (n, 2, 2) array of start and end points of the given segments.
+    values = (v for s in segments for v in (s.origin.x, s.origin.y, s.destination.x, s.destination.y))
+    return numpy.fromiter(values, float, 4 * len(segments)).reshape(len(segments), 2, 2)
+
+
+def ArrowHeads(points, head_width=0.5, head_length=0.5):
+    # Returns the (n, 3, 2) array of arrowhead triangles drawn at the end of each segment, with the same
+    # size as plt.arrow(head_width=0.5, head_length=0.5, length_includes_head=True).
+    # Zero-length segments get a triangle collapsed to a point, so row i always belongs to segment i.
+    start, end = points[:, 0, :], points[:, 1, :]
+    direction = end - start
+    length = numpy.hypot(direction[:, 0], direction[:, 1])
+    safe = numpy.where(length > 0, length, 1.0)
+    direction = direction / safe[:, None]
+    # The head never gets longer than the segment itself.
+    size = numpy.minimum(head_length, length)[:, None]
+    base = end - direction * size
+    normal = numpy.column_stack((-direction[:, 1], direction[:, 0])) * (head_width / 2)
+    return numpy.stack((end, base + normal, base - normal), axis=1)
+
+
+def VisibleMask(points, xlim, ylim):
+    # Returns a boolean array telling which segments have their bounding box inside the viewport.
+    xs, ys = points[:, :, 0], points[:, :, 1]
+    return ((xs.max(axis=1) >= xlim[0]) & (xs.min(axis=1) <= xlim[1]) &
+            (ys.max(axis=1) >= ylim[0]) & (ys.min(axis=1) <= ylim[1]))
+
+
+def DrawGraph(ax, g, segments=None, color='blue', label_limit=LABEL_LIMIT):
+    # Draws the graph 'g' on the axes 'ax' with a fixed number of artists: one LineCollection for the segments,
+    # one PolyCollection for the arrowheads and one scatter for the nodes.
+    # Arrowheads are left out when they would be smaller than a couple of pixels, and cost labels (and node names)
+    # are only added while the visible segments (and nodes) do not exceed 'label_limit', so a large graph is drawn
+    # without thousands of tiny or overlapping artists.
+    # 'segments' restricts the drawing to some segments (all of them by default).
+    # Returns a dictionary with the artists that were created: 'segments', 'arrows' (None when left out), 'nodes',
+    # 'arrow_rows' (position in 'segments' of each arrowhead), 'segment_labels' (segment id -> Text),
+    # 'node_labels' (node name -> Text) and 'labels_shown' (False when some labels were left out).
+    if segments is None:
+        segments = list(g.segments)
+    nodes = list(g.nodes)
+    points = SegmentArrays(segments)
+    xs = numpy.fromiter((n.x for n in nodes), float, len(nodes))
+    ys = numpy.fromiter((n.y for n in nodes), float, len(nodes))
+    artists = {}
+
+    # The data limits are computed here in one operation instead of path by path inside matplotlib.
+    if len(nodes):
+        ax.update_datalim(numpy.column_stack((xs, ys)))
+    if len(segments):
+        ax.update_datalim(points.reshape(-1, 2))
+    ax.autoscale_view()
+    xlim, ylim = ax.get_xlim(), ax.get_ylim()
+
+    artists['segments'] = LineCollection(points, colors=color, linewidths=1, zorder=1)
+    ax.add_collection(artists['segments'], autolim=False)
+    # Size of an arrowhead in pixels at the current zoom.
+    head_pixels = 0.5 * ax.bbox.width / max(xlim[1] - xlim[0], 1e-12)
+    visible = numpy.flatnonzero(VisibleMask(points, xlim, ylim)) if len(segments) else []
+    artists['arrows'] = None
+    if head_pixels >= 2 and len(visible):
+        artists['arrows'] = PolyCollection(ArrowHeads(points[visible]), facecolors=color, edgecolors=color, zorder=2)
+        ax.add_collection(artists['arrows'], autolim=False)
+    artists['nodes'] = ax.scatter(xs, ys, s=25, c='black', marker='o', zorder=3)
+
+    artists['arrow_rows'] = visible if artists['arrows'] is not None else []
+
+    # Labels only for what is inside the current viewport, and only when there are few enough of them.
+    artists['segment_labels'] = {}
+    artists['node_labels'] = {}
+    if len(visible) <= label_limit:
+        middle = points.mean(axis=1)
+        for i in visible:
+            artists['segment_labels'][segments[i].id] = ax.text(middle[i, 0], middle[i, 1], round(segments[i].cost, 2))
+    inside = numpy.flatnonzero((xs >= xlim[0]) & (xs <= xlim[1]) & (ys >= ylim[0]) & (ys <= ylim[1]))
+    artists['labels_shown'] = len(visible) <= label_limit and len(inside) <= label_limit
+    if len(inside) <= label_limit:
+        for i in inside:
+            artists['node_labels'][nodes[i].name] = ax.text(xs[i], ys[i], nodes[i].name, horizontalalignment='left',
+                                                            verticalalignment='bottom', color='red', fontsize=7)
+    return artists
+
+
+class GraphView:
+    # This class keeps track of the artists of a graph drawn on 'ax' so that single edits only touch the
+    # affected artists instead of clearing the axes and drawing everything again.
+    # Items drawn by Draw live in rows of the shared collections: removing one makes its row transparent.
+    # Items added afterwards get their own small artists, which are drawn onto the canvas with blitting.
+    def __init__(self, ax, canvas, color='blue', label_limit=LABEL_LIMIT):
+        self.ax = ax
+        self.canvas = canvas
+        self.color = color
+        self.label_limit = label_limit
+        self.current = False  # False until Draw runs, and again once something else draws on 'ax'.
+        self.artists = {}
+        self.segment_rows = {}  # Segment id -> row in the segment collection.
+        self.arrow_rows = {}  # Segment id -> row in the arrowhead collection.
+        self.node_rows = {}  # Node name -> row in the node scatter.
+        self.added = {}  # ('node', name) or ('segment', id) -> artists created after the last Draw.
+        self.labels = {}  # ('node', name) or ('segment', id) -> Text label.
+        self.show_labels = True
+        self.highlight = []  # Artists of the current highlight (see Highlight).
+
+    def Draw(self, g):
+        # Clears the axes and draws the whole graph 'g' with DrawGraph, remembering which row belongs to which item.
+        self.ax.clear()
+        self.highlight = []
+        segments = list(g.segments)
+        artists = DrawGraph(self.ax, g, segments, self.color, self.label_limit)
+        self.artists = artists
+        self.segment_rows = {s.id: i for i, s in enumerate(segments)}
+        self.arrow_rows = {segments[i].id: row for row, i in enumerate(artists['arrow_rows'])}
+        self.node_rows = {n.name: i for i, n in enumerate(g.nodes)}
+        self.added = {}
+        self.labels = {('segment', k): v for k, v in artists['segment_labels'].items()}
+        self.labels.update({('node', k): v for k, v in artists['node_labels'].items()})
+        # New items only get labels when the full drawing had room for them.
+        self.show_labels = artists['labels_shown']
+        # Every row gets its own color so single rows can be hidden later.
+        for key, count in (('segments', len(segments)), ('nodes', len(self.node_rows)),
+                           ('arrows', len(self.arrow_rows))):
+            if artists[key] is not None and count:
+                rgba = to_rgba('black' if key == 'nodes' else self.color)
+                colors = numpy.tile(rgba, (count, 1))
+                artists[key + '_colors'] = colors
+                self.SetColors(key)
+        self.current = True
+
+    def SetColors(self, key):
+        # Pushes the per-row color array of the collection 'key' to matplotlib.
+        collection, colors = self.artists[key], self.artists[key + '_colors']
+        if key == 'segments':
+            collection.set_color(colors)
+        else:
+            collection.set_facecolor(colors)
+            collection.set_edgecolor(colors)
+
+    def HideRow(self, key, row):
+        # Makes one row of the collection 'key' fully transparent.
+        self.artists[key + '_colors'][row, 3] = 0.0
+        self.SetColors(key)
+
+    def Forget(self, kind, name):
+        # Removes the label and the artists added later for one item. Returns True if something was removed.
+        removed = False
+        for artist in self.added.pop((kind, name), []):
+            artist.remove()
+            removed = True
+        label = self.labels.pop((kind, name), None)
+        if label is not None:
+            label.remove()
+            removed = True
+        return removed
+
+    def Limits(self):
+        # Returns the current (xlim, ylim) of the axes, applying any pending autoscale first.
+        return self.ax.get_xlim(), self.ax.get_ylim()
+
+    def Show(self, new_artists, points, limits):
+        # Makes the new artists visible. 'limits' are the Limits from before the artists were created.
+        # If every point is inside the current view and creating the artists did not autoscale the axes, they are
+        # drawn straight onto the canvas (blitting); otherwise the canvas is redrawn, since blitting would put them
+        # over a background drawn at the old scale.
+        xlim, ylim = self.Limits()
+        inside = all(xlim[0] <= x <= xlim[1] and ylim[0] <= y <= ylim[1] for x, y in points)
+        if (xlim, ylim) != limits:
+            self.canvas.draw_idle()
+            return
+        if not inside:
+            self.ax.update_datalim(points)
+            self.ax.autoscale_view()
+            self.canvas.draw_idle()
+            return
+        for artist in new_artists:
+            self.ax.draw_artist(artist)
+        self.canvas.blit(self.ax.bbox)
+
+    def AddNode(self, node):
+        # Draws a node added to the graph after the last Draw. Returns False if the view must be drawn again with Draw.
+        if not self.current:
+            return False
+        limits = self.Limits()
+        new_artists = self.ax.plot(node.x, node.y, 'ko', markersize=5, zorder=3)
+        if self.show_labels:
+            label = self.ax.text(node.x, node.y, node.name, horizontalalignment='left',
+                                 verticalalignment='bottom', color='red', fontsize=7)
+            self.labels[('node', node.name)] = label
+            new_artists.append(label)
+        self.added[('node', node.name)] = new_artists[:1]
+        self.Show(new_artists, [(node.x, node.y)], limits)
+        return True
+
+    def AddSegment(self, segment):
+        # Draws a segment added to the graph after the last Draw. Returns False if the view must be drawn again with Draw.
+        if not self.current:
+            return False
+        x0, y0, x1, y1 = segment.origin.x, segment.origin.y, segment.destination.x, segment.destination.y
+        limits = self.Limits()
+        new_artists = self.ax.plot([x0, x1], [y0, y1], color=self.color, linewidth=1, zorder=1)
+        head = ArrowHeads(numpy.array([[[x0, y0], [x1, y1]]]))[0]
+        new_artists.append(self.ax.add_patch(Polygon(head, closed=True, facecolor=self.color,
+                                                     edgecolor=self.color, zorder=2)))
+        self.added[('segment', segment.id)] = list(new_artists)
+        if self.show_labels:
+            label = self.ax.text((x0 + x1) / 2, (y0 + y1) / 2, round(segment.cost, 2))
+            self.labels[('segment', segment.id)] = label
+            new_artists.append(label)
+        self.Show(new_artists, [(x0, y0), (x1, y1)], limits)
+        return True
+
+    def RemoveSegment(self, segment, redraw=True):
+        # Removes a deleted segment from the view. Returns False if the view must be drawn again with Draw.
+        if not self.current:
+            return False
+        row = self.segment_rows.pop(segment.id, None)
+        if row is not None:
+            self.HideRow('segments', row)
+        row = self.arrow_rows.pop(segment.id, None)
+        if row is not None:
+            self.HideRow('arrows', row)
+        self.Forget('segment', segment.id)
+        if redraw:
+            # Pixels cannot be taken back from the canvas, so the existing artists are rendered again.
+            self.canvas.draw_idle()
+        return True
+
+    def RemoveNode(self, node, segments):
+        # Removes a deleted node and the deleted 'segments' that touched it. Returns False if the view must be
+        # drawn again with Draw.
+        if not self.current:
+            return False
+        for segment in segments:
+            self.RemoveSegment(segment, redraw=False)
+        row = self.node_rows.pop(node.name, None)
+        if row is not None:
+            self.HideRow('nodes', row)
+        self.Forget('node', node.name)
+        self.canvas.draw_idle()
+        return True
+
+    def Highlight(self, g, costs, segments=()):
+        # Highlights some nodes of 'g' over the drawn graph, colored from dark to light by their value in 'costs'
+        # (node name -> cost, such as the result of ReachableWithin), and the given 'segments' in orange.
+        # Everything is drawn as one scatter and one LineCollection with a single redraw, whatever their number.
+        # A previous highlight is removed first. Returns False if the view must be drawn again with Draw.
+        if not self.current:
+            return False
+        self.ClearHighlight(redraw=False)
+        segments = list(segments)
+        if segments:
+            lines = LineCollection(SegmentArrays(segments), colors='orange', linewidths=2.5, zorder=4)
+            self.ax.add_collection(lines, autolim=False)
+            self.highlight.append(lines)
+        nodes = [g.GetNodeByName(name) for name in costs]
+        xs = numpy.fromiter((n.x for n in nodes), float, len(nodes))
+        ys = numpy.fromiter((n.y for n in nodes), float, len(nodes))
+        values = numpy.fromiter(costs.values(), float, len(nodes))
+        self.highlight.append(self.ax.scatter(xs, ys, s=60, c=values, cmap='viridis', zorder=5))
+        self.canvas.draw_idle()
+        return True
+
+    def ClearHighlight(self, redraw=True):
+        # Removes the artists added by Highlight.
+        for artist in self.highlight:
+            artist.remove()
+        self.highlight = []
+        if redraw:
+            self.canvas.draw_idle()
@@ -0,0 +1,66 @@
+import multiprocessing
+import os
+from path import CostsFromOrigin
+from snapshot import GraphSnapshot, SnapshotArrays
+# `multiprocessing` runs the searches in worker processes, each with its own copy of the graph arrays.
+# `CostsFromOrigin` is the one-to-many Dijkstra search run for every origin.
+# `GraphSnapshot` is the compact read-only form of the graph sent to the workers.
+
+# Snapshot used by the searches of a worker process, set once when the worker starts.
+worker_snapshot = None
+
+
+def StartWorker(arrays):
+    # Runs once in each worker process: rebuilds the snapshot from the arrays sent by BatchRoute.
+    global worker_snapshot
+    worker_snapshot = GraphSnapshot(*arrays)
+
+
+def RouteGroup(task):
+    # Runs in a worker process: answers every destination of one origin with a single search.
+    origin, destinations = task
+    costs = CostsFromOrigin(worker_snapshot, origin, destinations)
+    return [(origin, destination, costs.get(destination)) for destination in destinations]
+
+
+def GroupByOrigin(pairs):
+    # Returns a list of (origin, [destinations]) with the origins in the order they first appear in 'pairs'.
+    groups = {}
+    for origin, destination in pairs:
+        groups.setdefault(origin, []).append(destination)
+    return list(groups.items())
+
+
+def BatchRoute(g, pairs, processes=None, chunk_size=1):
+    # Computes the cost of the cheapest route for every (origin name, destination name) pair of 'pairs'.
+    # Yields (origin, destination, cost) tuples as soon as they are computed, in no particular order;
+    # cost is None when a node is unknown or the destination cannot be reached.
+    # Pairs are grouped by origin so one Dijkstra tree answers all the destinations of an origin, and the groups
+    # are shared among 'processes' worker processes (one per CPU by default). The graph is frozen once and sent to
+    # each worker when it starts, not with every task. 'chunk_size' groups are sent to a worker at a time.
+    # 'g' may be a Graph or a GraphSnapshot. Scripts using several processes need an
+    # 'if __name__ == "__main__":' guard on platforms that start workers by importing the main module (Windows, macOS).
+    s = g if isinstance(g, GraphSnapshot) else g.Freeze()
+    tasks = GroupByOrigin(pairs)
+    if processes is None:
+        processes = os.cpu_count() or 1
+    processes = min(processes, len(tasks))
+    if processes <= 1:
+        # Not worth starting processes: the groups are answered here, one after another.
+        for origin, destinations in tasks:
+            costs = CostsFromOrigin(s, origin, destinations)
+            for destination in destinations:
+                yield origin, destination, costs.get(destination)
+        return
+    # Segment ids are left out: the workers only compute costs.
+    with multiprocessing.Pool(processes, StartWorker, (SnapshotArrays(s, segment_ids=False),)) as pool:
+        for results in pool.imap_unordered(RouteGroup, tasks, chunk_size):
+            yield from results
+
+
+def CostMatrix(g, origins, destinations, processes=None):
+    # Returns the matrix of route costs from every node of 'origins' to every node of 'destinations':
+    # matrix[i][j] is the cost from origins[i] to destinations[j], or None if there is no route.
+    pairs = [(origin, destination) for origin in dict.fromkeys(origins) for destination in dict.fromkeys(destinations)]
+    costs = {(origin, destination): cost for origin, destination, cost in BatchRoute(g, pairs, processes)}
+    return [[costs[origin, destination] for destination in destinations] for origin in origins]
@@ -1,20 +1,57 @@
+import math
 from node import *
 # Importing all definitions and functions from the 'node' module.
 # This includes the Node class and the Distance function, which calculates
 # the Euclidean distance between two nodes.
+# `math` is used by the bulk cost computation when NumPy is not installed.
+try:
+   import numpy
+except ImportError:
+   numpy = None
 
 
 class Segment():
    # This class represents a segment in a graph, connecting two nodes (n1 and n2).
-   def __init__(self, n1, n2):
-       # Initializes a Segment object with the origin node, destination node, and cost.
+   # __slots__ stores the attributes in fixed fields instead of a per-instance __dict__, which saves memory on large graphs.
+   __slots__ = ('id', 'origin', 'destination', 'cost')
+
+   def __init__(self, n1, n2, cost=None, segment_id=None):
+       # Initializes a Segment object with the id, origin node, destination node, and cost.
        # n1: Origin node of the segment.
        # n2: Destination node of the segment.
+       # cost: Optional precomputed cost, used by BuildSegments to skip the per-segment distance.
+       # segment_id: Identifier of the segment inside a graph (None until it is given one).
+       self.id = segment_id
        self.origin = n1  # The starting point of the segment (node n1).
        self.destination = n2  # The endpoint of the segment (node n2).
-       self.cost = Distance(n1, n2)
+       self.cost = Distance(n1, n2) if cost is None else cost
        # The cost of the segment, calculated as the Euclidean distance
        # between the origin (n1) and destination (n2) nodes using the
        # Distance function from the 'node' module.
 
 
+def ComputeCosts(x1, y1, x2, y2):
+   # Computes the Euclidean distance between (x1[i], y1[i]) and (x2[i], y2[i]) for every i.
+   # The inputs are sequences of floats (lists or arrays) of the same length.
+   # With NumPy all distances are computed in one vectorized operation; otherwise a single list
+   # comprehension is used. Both do the same operations in the same order as Distance, so the
+   # returned list of floats is bit for bit what Distance returns for each pair.
+   if numpy is not None:
+       dx = numpy.asarray(x1, dtype=float) - numpy.asarray(x2, dtype=float)
+       dy = numpy.asarray(y1, dtype=float) - numpy.asarray(y2, dtype=float)
+       return numpy.sqrt(dx * dx + dy * dy).tolist()
+   sqrt = math.sqrt
+   return [sqrt((a - c) * (a - c) + (b - d) * (b - d)) for a, b, c, d in zip(x1, y1, x2, y2)]
+
+
+def BuildSegments(origins, destinations, segment_ids=None):
+   # Builds one Segment per (origins[i], destinations[i]) pair of nodes, computing all the costs at once
+   # with ComputeCosts. If 'segment_ids' is given, segment i gets segment_ids[i] as its id.
+   x1 = [n.x for n in origins]
+   y1 = [n.y for n in origins]
+   x2 = [n.x for n in destinations]
+   y2 = [n.y for n in destinations]
+   costs = ComputeCosts(x1, y1, x2, y2)
+   if segment_ids is None:
+       return [Segment(n1, n2, cost) for n1, n2, cost in zip(origins, destinations, costs)]
+   return [Segment(n1, n2, cost, segment_id) for n1, n2, cost, segment_id in zip(origins, destinations, costs, segment_ids)]
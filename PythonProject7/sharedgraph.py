@@ -0,0 +1,111 @@
+import struct
+import sys
+from array import array
+from multiprocessing import resource_tracker, shared_memory
+from graph_binary import ArrayBytes, EncodeGraph, Padding, ReadGraph
+from snapshot import BuildGrid, GraphSnapshot, SnapshotGrid
+# `shared_memory` holds one copy of a frozen graph that every process on the machine can map.
+# The block uses the layout of the binary graph files (see graph_binary.py) followed by a grid over the nodes,
+# so readers get a GraphSnapshot and closest-node queries straight from the shared block, without copying it.
+
+# Header of the grid section: cell size, smallest x, smallest y, number of columns, number of rows.
+# It is followed by the cell offsets (columns * rows + 1 int64) and the nodes of every cell (n int64).
+GRID_HEADER = struct.Struct('<dddqq')
+
+
+class SharedGraph:
+    # This class represents a graph snapshot stored in a shared memory block.
+    # Create one with PublishGraph in the process that owns the graph and with AttachGraph(name) in the readers.
+    def __init__(self, block, snapshot, owner):
+        # block: the SharedMemory object. snapshot: GraphSnapshot reading from it (with its grid).
+        # owner: True for the process that created the block and must eventually call Unlink.
+        self.block = block
+        self.snapshot = snapshot
+        self.owner = owner
+
+    @property
+    def name(self):
+        # Name other processes pass to AttachGraph.
+        return self.block.name
+
+    def Close(self):
+        # Stops using the block in this process. The snapshot (and any array taken from it) must not be used after.
+        self.snapshot = None
+        self.block.close()
+
+    def Unlink(self):
+        # Frees the block once every process has closed it. Only the process that published it should call this.
+        self.block.unlink()
+
+
+def PublishGraph(g, name=None):
+    # Copies a frozen snapshot of 'g' (a Graph or a GraphSnapshot) into a new shared memory block and returns
+    # a SharedGraph. 'name' chooses the block name; by default the system picks a free one.
+    # The caller must call Close and Unlink when the readers are done.
+    s = g if isinstance(g, GraphSnapshot) else g.Freeze()
+    parts = EncodeGraph(s)
+    grid = BuildGrid(s.xs, s.ys)
+    size = sum(len(part) for part in parts)
+    parts.append(b'\0' * Padding(size))
+    parts.append(GRID_HEADER.pack(grid.cell_size, grid.min_x, grid.min_y, grid.columns, grid.rows))
+    parts.append(ArrayBytes(grid.cell_offsets))
+    parts.append(ArrayBytes(grid.cell_nodes))
+
+    block = shared_memory.SharedMemory(name=name, create=True, size=sum(len(part) for part in parts))
+    position = 0
+    for part in parts:
+        block.buf[position:position + len(part)] = part
+        position += len(part)
+    return SharedGraph(block, ReadSharedGraph(block), True)
+
+
+def AttachGraph(name):
+    # Maps the shared memory block 'name' created by PublishGraph and returns a SharedGraph reading from it.
+    # Nothing is copied: the snapshot arrays point into the block. Call Close when done.
+    # Raises FileNotFoundError if there is no such block and ValueError if it does not hold a graph.
+    block = OpenBlock(name)
+    try:
+        return SharedGraph(block, ReadSharedGraph(block), False)
+    except ValueError:
+        block.close()
+        raise
+
+
+def OpenBlock(name):
+    # Maps an existing shared memory block without registering it with the resource tracker. A registered block
+    # is deleted when the process that mapped it exits, which would remove it from under the publisher and the
+    # other readers. Python 3.13 has track=False for this; older versions register unconditionally, so the
+    # registration is skipped for the duration of the call.
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    register = resource_tracker.register
+    resource_tracker.register = lambda *args: None
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+
+def ReadSharedGraph(block):
+    # Returns the GraphSnapshot stored in 'block', with the grid of the block attached to it.
+    s, end = ReadGraph(block.buf, block.name)
+    position = end + Padding(end)
+    if position + GRID_HEADER.size > block.size:
+        raise ValueError(f"'{block.name}' has no grid section")
+    cell_size, min_x, min_y, columns, rows = GRID_HEADER.unpack_from(block.buf, position)
+    position += GRID_HEADER.size
+    sizes = (columns * rows + 1, len(s))
+    if position + 8 * sum(sizes) > block.size:
+        raise ValueError(f"'{block.name}' is truncated")
+    arrays = []
+    for count in sizes:
+        part = block.buf[position:position + 8 * count]
+        position += 8 * count
+        if sys.byteorder != 'little':
+            values = array('q', part.tobytes())
+            values.byteswap()
+            arrays.append(values)
+        else:
+            arrays.append(part.cast('q'))
+    s.grid = SnapshotGrid(cell_size, min_x, min_y, columns, rows, *arrays)
+    return s
@@ -0,0 +1,175 @@
+import math
+from array import array
+# `array` stores the coordinates, offsets, targets and costs as compact typed arrays.
+# `math` is used for the cell arithmetic of the grid and the Euclidean distance.
+
+
+class GraphSnapshot:
+    # This class represents a frozen, read-only copy of a graph in compressed sparse row (CSR) form.
+    # Node i is described by names[i], xs[i] and ys[i]. The segments leaving node i are the entries
+    # offsets[i] to offsets[i + 1] - 1 of targets (index of the destination node), costs and segment_ids.
+    # Traversals only index flat arrays instead of following Node and Segment objects.
+    def __init__(self, names, xs, ys, offsets, targets, costs, segment_ids, segment_order=None, index=None):
+        # The arrays are exposed through read-only memoryviews so the snapshot cannot be modified.
+        # names and segment_ids are read-only sequences (tuples, or string tables of a binary file).
+        # segment_order[k] is the position of the k-th segment added to the graph, so the segments can be listed in
+        # insertion order; None if that order is not known (see SegmentOrder).
+        # index maps each node name to its index; any object with a get(name) method can be used.
+        self.names = names
+        self.xs = memoryview(xs).toreadonly()
+        self.ys = memoryview(ys).toreadonly()
+        self.offsets = memoryview(offsets).toreadonly()
+        self.targets = memoryview(targets).toreadonly()
+        self.costs = memoryview(costs).toreadonly()
+        self.segment_ids = segment_ids
+        self.segment_order = None if segment_order is None else memoryview(segment_order).toreadonly()
+        # Segment ids in insertion order, kept by BuildSnapshot so segment_order is only computed when it is needed.
+        self.added_ids = None
+        if index is None:
+            index = {name: i for i, name in enumerate(names)}
+        self.index = index
+        self.grid = None  # SnapshotGrid over the coordinates, built by the first closest-node query.
+
+    def __len__(self):
+        return len(self.names)
+
+    def IndexOf(self, name):
+        # Returns the index of the node called 'name', or None if it is not in the snapshot.
+        return self.index.get(name)
+
+    def OutDegree(self, i):
+        # Returns the number of segments leaving node i.
+        return self.offsets[i + 1] - self.offsets[i]
+
+    def Edges(self, i):
+        # Returns the range of edge positions of the segments leaving node i.
+        return range(self.offsets[i], self.offsets[i + 1])
+
+    def SegmentOrder(self):
+        # Returns the positions of the segments in the order they were added to the graph (the positions themselves
+        # when that order is not known). A snapshot of a Graph computes them the first time they are asked for.
+        if self.segment_order is None:
+            if self.added_ids is None:
+                return range(len(self.targets))
+            position = dict(zip(self.segment_ids, range(len(self.targets))))
+            self.segment_order = memoryview(array('q', map(position.__getitem__, self.added_ids))).toreadonly()
+            self.added_ids = None
+        return self.segment_order
+
+    def GetNeighbors(self, i):
+        # Returns the indices of the nodes reached by the segments leaving node i.
+        return self.targets[self.offsets[i]:self.offsets[i + 1]].tolist()
+
+    def GetClosest(self, x, y):
+        # Returns the index of the node closest to (x, y), or None if the snapshot has no nodes.
+        if self.grid is None:
+            self.grid = BuildGrid(self.xs, self.ys)
+        return self.grid.Nearest(self.xs, self.ys, x, y)
+
+
+class SnapshotGrid:
+    # This class represents a uniform grid over the node coordinates of a snapshot, stored in flat arrays like the
+    # snapshot itself so it can also live in a shared memory block. The cells are numbered row by row; the nodes of
+    # cell c are cell_nodes[cell_offsets[c]:cell_offsets[c + 1]].
+    def __init__(self, cell_size, min_x, min_y, columns, rows, cell_offsets, cell_nodes):
+        self.cell_size = cell_size
+        self.min_x = min_x
+        self.min_y = min_y
+        self.columns = columns
+        self.rows = rows
+        self.cell_offsets = cell_offsets
+        self.cell_nodes = cell_nodes
+
+    def Nearest(self, xs, ys, x, y):
+        # Returns the index of the node closest to (x, y). Rings of cells around the cell of (x, y) are visited until
+        # no unvisited cell can hold a closer node, as in SpatialGrid.Nearest.
+        if not len(self.cell_nodes):
+            return None
+        size = self.cell_size
+        cx = math.floor((x - self.min_x) / size)
+        cy = math.floor((y - self.min_y) / size)
+        # Rings closer than the grid itself are empty and skipped.
+        r = max(0, -cx, cx - self.columns + 1, -cy, cy - self.rows + 1)
+        last = max(cx, self.columns - 1 - cx, cy, self.rows - 1 - cy)
+        offsets, members = self.cell_offsets, self.cell_nodes
+        best, best_distance = None, math.inf
+        while r <= last:
+            x0, x1 = max(cx - r, 0), min(cx + r, self.columns - 1)
+            y0, y1 = max(cy - r, 0), min(cy + r, self.rows - 1)
+            for i in range(x0, x1 + 1):
+                # Only the edges of the ring: whole columns at both ends, the top and bottom rows in between.
+                full = i == cx - r or i == cx + r
+                for j in (range(y0, y1 + 1) if full else [j for j in (cy - r, cy + r) if y0 <= j <= y1]):
+                    c = j * self.columns + i
+                    for k in range(offsets[c], offsets[c + 1]):
+                        node = members[k]
+                        distance = math.hypot(xs[node] - x, ys[node] - y)
+                        if distance < best_distance:
+                            best, best_distance = node, distance
+            # Every cell of the next rings is at least r cells away from (x, y).
+            if best_distance <= r * size:
+                break
+            r += 1
+        return best
+
+
+def BuildGrid(xs, ys):
+    # Builds a SnapshotGrid over the coordinates 'xs' and 'ys' with about two nodes per cell (a counting sort of
+    # the nodes by cell, so it takes linear time).
+    n = len(xs)
+    if n == 0:
+        return SnapshotGrid(1.0, 0.0, 0.0, 1, 1, array('q', [0, 0]), array('q'))
+    min_x, max_x, min_y, max_y = min(xs), max(xs), min(ys), max(ys)
+    width, height = max_x - min_x, max_y - min_y
+    # As in SpatialGrid, the cells are never smaller than 2 * max(width, height) / n, so a very thin area does
+    # not get a dense array with millions of empty cells.
+    if width > 0 or height > 0:
+        size = max(math.sqrt(2 * width * height / n), 2 * max(width, height) / n)
+    else:
+        size = 1.0
+    columns = math.floor(width / size) + 1
+    rows = math.floor(height / size) + 1
+    cells = [min(math.floor((ys[i] - min_y) / size), rows - 1) * columns + min(math.floor((xs[i] - min_x) / size),
+                                                                               columns - 1) for i in range(n)]
+    offsets = array('q', bytes(8 * (columns * rows + 1)))
+    for c in cells:
+        offsets[c + 1] += 1
+    for c in range(columns * rows):
+        offsets[c + 1] += offsets[c]
+    fill = array('q', offsets)
+    members = array('q', bytes(8 * n))
+    for i, c in enumerate(cells):
+        members[fill[c]] = i
+        fill[c] += 1
+    return SnapshotGrid(size, min_x, min_y, columns, rows, offsets, members)
+
+
+def SnapshotArrays(s, segment_ids=True):
+    # Returns the arguments of GraphSnapshot for a copy of 's' made of plain picklable objects, to send the snapshot
+    # to another process. Without 'segment_ids' the ids and their insertion order are left out, for work that only
+    # needs the costs.
+    order = array('q', s.SegmentOrder()) if segment_ids else None
+    return (tuple(s.names), array('d', s.xs), array('d', s.ys), array('q', s.offsets), array('q', s.targets),
+            array('d', s.costs), tuple(s.segment_ids) if segment_ids else (), order)
+
+
+def BuildSnapshot(g):
+    # Builds a GraphSnapshot of 'g'. Nodes keep the insertion order of the graph and the
+    # segments of each node keep the order in which they were added; SegmentOrder gives the order of all of them.
+    names = list(g.node_index)
+    index = {name: i for i, name in enumerate(names)}
+    xs = array('d', (node.x for node in g.nodes))
+    ys = array('d', (node.y for node in g.nodes))
+    offsets = array('q', [0])
+    targets = array('q')
+    costs = array('d')
+    segment_ids = []
+    for name in names:
+        for segment in g.GetOutgoingSegments(name):
+            targets.append(index[segment.destination.name])
+            costs.append(segment.cost)
+            segment_ids.append(segment.id)
+        offsets.append(len(targets))
+    s = GraphSnapshot(tuple(names), xs, ys, offsets, targets, costs, tuple(segment_ids), None, index)
+    s.added_ids = tuple(g.segment_index)
+    return s
@@ -0,0 +1,424 @@
+import heapq
+import math
+# `heapq` keeps the k best candidates during k-nearest queries.
+# `math` is used for the cell arithmetic and the Euclidean distance.
+
+# Segments whose bounding box covers more cells than this are not stored in the cells of a SegmentGrid but in a
+# separate list that every query checks, so one very long segment cannot fill thousands of cells.
+MAX_SEGMENT_CELLS = 64
+
+
+class UniformGrid:
+    # This class represents the cells of a uniform grid over the plane, shared by the node and segment indexes.
+    # Only the occupied cells are stored, and the queries visit rings of cells around the query point.
+    def __init__(self):
+        # cells: maps a cell (cx, cy) to the list of items stored in it.
+        # positions: maps each stored item to where it was stored.
+        # cell_size: side of a cell, recomputed from the density of the items when the grid is rebuilt.
+        # The bounds keep the range of occupied cells so queries never walk outside of them. Removals only mark
+        # them as stale when an emptied cell was on the border (see TrimBounds).
+        self.cells = {}
+        self.positions = {}
+        self.cell_size = 1.0
+        self.rebuild_at = 8
+        self.min_cx = self.min_cy = math.inf
+        self.max_cx = self.max_cy = -math.inf
+        self.stale_bounds = False
+
+    def __len__(self):
+        return len(self.positions)
+
+    def Cell(self, x, y):
+        # Returns the cell that contains the point (x, y).
+        return math.floor(x / self.cell_size), math.floor(y / self.cell_size)
+
+    def Clear(self):
+        # Empties the cells and the bounds. The items have to be stored again.
+        self.cells = {}
+        self.positions = {}
+        self.min_cx = self.min_cy = math.inf
+        self.max_cx = self.max_cy = -math.inf
+        self.stale_bounds = False
+
+    def Extend(self, x0, y0, x1, y1):
+        # Grows the bounds of the occupied cells to include the cells from (x0, y0) to (x1, y1).
+        self.min_cx = min(self.min_cx, x0)
+        self.max_cx = max(self.max_cx, x1)
+        self.min_cy = min(self.min_cy, y0)
+        self.max_cy = max(self.max_cy, y1)
+
+    def Span(self):
+        # Returns the number of cells inside the bounds, which is what a query may have to walk.
+        if not self.cells:
+            return 0
+        return (self.max_cx - self.min_cx + 1) * (self.max_cy - self.min_cy + 1)
+
+    def Emptied(self, i, j):
+        # Called when the cell (i, j) becomes empty. If it was on the border the bounds may shrink; they are
+        # recomputed by the next query instead of on every removal.
+        if i == self.min_cx or i == self.max_cx or j == self.min_cy or j == self.max_cy:
+            self.stale_bounds = True
+
+    def TrimBounds(self):
+        # Recomputes the bounds from the occupied cells if a removal left them too wide.
+        if self.stale_bounds:
+            self.stale_bounds = False
+            self.min_cx = self.min_cy = math.inf
+            self.max_cx = self.max_cy = -math.inf
+            if self.cells:
+                self.Extend(min(i for i, _ in self.cells), min(j for _, j in self.cells),
+                            max(i for i, _ in self.cells), max(j for _, j in self.cells))
+
+    @staticmethod
+    def DensityCellSize(width, height, count):
+        # Returns a cell size that leaves about two of 'count' items spread over a width x height area in each cell.
+        # The cells are never smaller than 2 * max(width, height) / count, so the long side of a very thin area gets
+        # at most about count / 2 cells and the grid never spans many more cells than there are items.
+        if width > 0 or height > 0:
+            return max(math.sqrt(2 * width * height / count), 2 * max(width, height) / count)
+        return 1.0
+
+    def Ring(self, cx, cy, r):
+        # Yields the non-empty cells at Chebyshev distance 'r' from (cx, cy), clipped to the occupied bounds.
+        x0, x1 = max(cx - r, self.min_cx), min(cx + r, self.max_cx)
+        y0, y1 = max(cy - r, self.min_cy), min(cy + r, self.max_cy)
+        if x0 > x1 or y0 > y1:
+            return
+        cells = self.cells
+        # The left and right columns of the ring are scanned completely.
+        columns = [cx - r] if r == 0 else [cx - r, cx + r]
+        for i in columns:
+            if x0 <= i <= x1:
+                for j in range(y0, y1 + 1):
+                    cell = cells.get((i, j))
+                    if cell:
+                        yield cell
+        # The columns in between only touch the top and bottom rows of the ring.
+        rows = [j for j in (cy - r, cy + r) if y0 <= j <= y1 and r > 0]
+        if rows:
+            for i in range(max(x0, cx - r + 1), min(x1, cx + r - 1) + 1):
+                for j in rows:
+                    cell = cells.get((i, j))
+                    if cell:
+                        yield cell
+
+    def Rings(self, cx, cy):
+        # Yields (r, non-empty cells at Chebyshev distance r) from the first to the last ring around (cx, cy) that
+        # can hold an occupied cell. Once a ring has more cells than are occupied, the occupied cells left are
+        # grouped by ring in one pass instead, so a far away query never walks rings of empty cells.
+        self.TrimBounds()
+        r = self.StartRing(cx, cy)
+        last = self.LastRing(cx, cy)
+        while r <= last:
+            if 8 * r > len(self.cells):
+                rings = {}
+                for (i, j), cell in self.cells.items():
+                    k = max(abs(i - cx), abs(j - cy))
+                    if k >= r:
+                        rings.setdefault(k, []).append(cell)
+                for k in sorted(rings):
+                    yield k, rings[k]
+                return
+            yield r, self.Ring(cx, cy, r)
+            r += 1
+
+    def StartRing(self, cx, cy):
+        # Returns the first ring around (cx, cy) that can contain an occupied cell.
+        return max(0, self.min_cx - cx, cx - self.max_cx, self.min_cy - cy, cy - self.max_cy)
+
+    def LastRing(self, cx, cy):
+        # Returns the last ring around (cx, cy) that can contain an occupied cell.
+        return max(cx - self.min_cx, self.max_cx - cx, cy - self.min_cy, self.max_cy - cy)
+
+    def CellsInBox(self, x_min, y_min, x_max, y_max):
+        # Yields the non-empty cells that overlap the box from (x_min, y_min) to (x_max, y_max).
+        self.TrimBounds()
+        x0, y0 = self.Cell(x_min, y_min)
+        x1, y1 = self.Cell(x_max, y_max)
+        x0, x1 = max(x0, self.min_cx), min(x1, self.max_cx)
+        y0, y1 = max(y0, self.min_cy), min(y1, self.max_cy)
+        if x0 > x1 or y0 > y1:
+            return
+        if (x1 - x0 + 1) * (y1 - y0 + 1) > len(self.cells):
+            # The box covers more cells than there are occupied ones, so walk the occupied cells instead.
+            for (i, j), cell in self.cells.items():
+                if x0 <= i <= x1 and y0 <= j <= y1:
+                    yield cell
+        else:
+            for i in range(x0, x1 + 1):
+                for j in range(y0, y1 + 1):
+                    cell = self.cells.get((i, j))
+                    if cell:
+                        yield cell
+
+
+class SpatialGrid(UniformGrid):
+    # This class represents a uniform grid over the plane used to find nodes by position.
+    # Every node is stored in the cell that contains its (x, y) coordinates, so a query only
+    # has to look at the cells around the query point instead of at every node of the graph.
+    # positions maps each stored node to its cell.
+
+    def Insert(self, node):
+        # Adds a node to the grid. The grid is rebuilt with a new cell size whenever the
+        # number of nodes doubles or falls to a quarter, which keeps the inserts O(1) amortized.
+        # It is also rebuilt while it is small or when a far away node stretches the occupied
+        # area well beyond the number of nodes, so the cell size always follows the coordinates.
+        key = self.Cell(node.x, node.y)
+        self.cells.setdefault(key, []).append(node)
+        self.positions[node] = key
+        self.Extend(key[0], key[1], key[0], key[1])
+        count = len(self.positions)
+        if count > self.rebuild_at or count <= 8 or self.Span() > 16 * count:
+            self.Rebuild()
+
+    def InsertMany(self, nodes):
+        # Adds many nodes and rebuilds the grid once, instead of checking the cell size after every node.
+        self.positions.update(dict.fromkeys(nodes))
+        self.Rebuild()
+
+    def Remove(self, node):
+        # Removes a node from the grid. Returns False if the node was not stored.
+        key = self.positions.pop(node, None)
+        if key is None:
+            return False
+        cell = self.cells[key]
+        cell.remove(node)
+        if not cell:
+            del self.cells[key]
+            self.Emptied(*key)
+        if 8 < len(self.positions) < self.rebuild_at // 4:
+            self.Rebuild()
+        return True
+
+    def Move(self, node):
+        # Updates the cell of a node whose coordinates have changed.
+        if self.Remove(node):
+            self.Insert(node)
+
+    def Rebuild(self):
+        # Chooses a cell size that leaves about two nodes per cell and re-distributes the nodes.
+        nodes = list(self.positions)
+        self.Clear()
+        self.rebuild_at = max(8, 2 * len(nodes))
+        if nodes:
+            width = max(n.x for n in nodes) - min(n.x for n in nodes)
+            height = max(n.y for n in nodes) - min(n.y for n in nodes)
+            self.cell_size = self.DensityCellSize(width, height, len(nodes))
+        for node in nodes:
+            key = self.Cell(node.x, node.y)
+            self.cells.setdefault(key, []).append(node)
+            self.positions[node] = key
+        if self.cells:
+            self.Extend(min(i for i, _ in self.cells), min(j for _, j in self.cells),
+                        max(i for i, _ in self.cells), max(j for _, j in self.cells))
+
+    def Nearest(self, x, y):
+        # Returns the node closest to (x, y), or None if the grid is empty.
+        # Rings are visited from the inside out; a point in ring r + 1 is at least r * cell_size away
+        # from the query, so the search stops as soon as the best distance is within that bound.
+        if not self.positions:
+            return None
+        cx, cy = self.Cell(x, y)
+        best = None
+        best_distance = math.inf
+        for r, ring in self.Rings(cx, cy):
+            for cell in ring:
+                for node in cell:
+                    distance = math.hypot(node.x - x, node.y - y)
+                    if distance < best_distance:
+                        best_distance = distance
+                        best = node
+            if best is not None and best_distance <= r * self.cell_size:
+                break
+        return best
+
+    def KNearest(self, x, y, k):
+        # Returns up to 'k' nodes ordered from the closest to the farthest from (x, y).
+        if k <= 0 or not self.positions:
+            return []
+        cx, cy = self.Cell(x, y)
+        heap = []  # Max-heap (by negated distance) holding the k best candidates found so far.
+        counter = 0
+        for r, ring in self.Rings(cx, cy):
+            for cell in ring:
+                for node in cell:
+                    distance = math.hypot(node.x - x, node.y - y)
+                    counter += 1
+                    if len(heap) < k:
+                        heapq.heappush(heap, (-distance, -counter, node))
+                    elif distance < -heap[0][0]:
+                        heapq.heapreplace(heap, (-distance, -counter, node))
+            if len(heap) == k and -heap[0][0] <= r * self.cell_size:
+                break
+        return [node for _, _, node in sorted(heap, key=lambda item: (-item[0], -item[1]))]
+
+    def WithinRadius(self, x, y, radius):
+        # Returns the nodes whose distance to (x, y) is at most 'radius', ordered by distance.
+        if radius < 0 or not self.positions:
+            return []
+        found = []
+        for cell in self.CellsInBox(x - radius, y - radius, x + radius, y + radius):
+            for node in cell:
+                distance = math.hypot(node.x - x, node.y - y)
+                if distance <= radius:
+                    found.append((distance, node))
+        found.sort(key=lambda item: item[0])
+        return [node for _, node in found]
+
+    def InRectangle(self, x_min, y_min, x_max, y_max):
+        # Returns the nodes inside the rectangle from (x_min, y_min) to (x_max, y_max), borders included.
+        return [node for cell in self.CellsInBox(x_min, y_min, x_max, y_max) for node in cell
+                if x_min <= node.x <= x_max and y_min <= node.y <= y_max]
+
+
+def SegmentDistance(segment, x, y):
+    # Returns the distance from (x, y) to the closest point of 'segment'.
+    x0, y0 = segment.origin.x, segment.origin.y
+    dx, dy = segment.destination.x - x0, segment.destination.y - y0
+    length = dx * dx + dy * dy
+    t = 0.0 if length == 0 else max(0.0, min(1.0, ((x - x0) * dx + (y - y0) * dy) / length))
+    return math.hypot(x0 + t * dx - x, y0 + t * dy - y)
+
+
+def SegmentMeetsRectangle(segment, x_min, y_min, x_max, y_max):
+    # Returns True if some point of 'segment' is inside the rectangle, borders included.
+    # The segment is clipped against the four sides (Liang-Barsky): it meets the rectangle if a part of it is left.
+    x0, y0 = segment.origin.x, segment.origin.y
+    dx, dy = segment.destination.x - x0, segment.destination.y - y0
+    start, end = 0.0, 1.0
+    for p, q in ((-dx, x0 - x_min), (dx, x_max - x0), (-dy, y0 - y_min), (dy, y_max - y0)):
+        if p == 0:
+            if q < 0:
+                return False  # Parallel to this side and outside of it.
+        elif p < 0:
+            start = max(start, q / p)
+        else:
+            end = min(end, q / p)
+        if start > end:
+            return False
+    return True
+
+
+class SegmentGrid(UniformGrid):
+    # This class represents a uniform grid used to find segments by position. Every segment is stored in all the
+    # cells covered by its bounding box, so the closest point of a segment to any query point lies in a cell
+    # that holds it and the ring search of SpatialGrid still applies.
+    # positions maps each stored segment to the cells it was stored in, (x0, y0, x1, y1), or None for the segments
+    # kept in 'large' (see MAX_SEGMENT_CELLS). Node coordinates are read when a segment is stored: call Rebuild
+    # after moving nodes.
+    def __init__(self):
+        super().__init__()
+        self.large = {}  # Segments covering too many cells, checked by every query (a dict keeps their order).
+
+    def CellRange(self, segment):
+        # Returns the cells (x0, y0, x1, y1) covered by the bounding box of 'segment'.
+        o, d = segment.origin, segment.destination
+        x0, y0 = self.Cell(min(o.x, d.x), min(o.y, d.y))
+        x1, y1 = self.Cell(max(o.x, d.x), max(o.y, d.y))
+        return x0, y0, x1, y1
+
+    def Store(self, segment):
+        # Puts 'segment' into its cells, or into 'large' if it covers too many of them.
+        x0, y0, x1, y1 = self.CellRange(segment)
+        if (x1 - x0 + 1) * (y1 - y0 + 1) > MAX_SEGMENT_CELLS:
+            self.positions[segment] = None
+            self.large[segment] = None
+            return
+        cells = self.cells
+        for i in range(x0, x1 + 1):
+            for j in range(y0, y1 + 1):
+                cells.setdefault((i, j), []).append(segment)
+        self.positions[segment] = (x0, y0, x1, y1)
+        self.Extend(x0, y0, x1, y1)
+
+    def Insert(self, segment):
+        # Adds a segment to the grid. As in SpatialGrid, the grid is rebuilt with a new cell size whenever the number
+        # of segments doubles or falls to a quarter, while it is small, and when a far away segment stretches the
+        # occupied area well beyond the number of segments.
+        self.Store(segment)
+        count = len(self.positions)
+        if count > self.rebuild_at or count <= 8 or self.Span() > 16 * count:
+            self.Rebuild()
+
+    def InsertMany(self, segments):
+        # Adds many segments and rebuilds the grid once.
+        self.positions.update(dict.fromkeys(segments))
+        self.Rebuild()
+
+    def Remove(self, segment):
+        # Removes a segment from the grid. Returns False if the segment was not stored.
+        if segment not in self.positions:
+            return False
+        span = self.positions.pop(segment)
+        if span is None:
+            del self.large[segment]
+        else:
+            x0, y0, x1, y1 = span
+            for i in range(x0, x1 + 1):
+                for j in range(y0, y1 + 1):
+                    cell = self.cells[(i, j)]
+                    cell.remove(segment)
+                    if not cell:
+                        del self.cells[(i, j)]
+                        self.Emptied(i, j)
+        if 8 < len(self.positions) < self.rebuild_at // 4:
+            self.Rebuild()
+        return True
+
+    def Rebuild(self):
+        # Chooses the cell size and re-distributes the segments. Cells hold about two segments, but are never smaller
+        # than the average extent of a segment, so most segments only cover a few cells.
+        segments = list(self.positions)
+        self.Clear()
+        self.large = {}
+        self.rebuild_at = max(8, 2 * len(segments))
+        if segments:
+            xs = [n.x for s in segments for n in (s.origin, s.destination)]
+            ys = [n.y for s in segments for n in (s.origin, s.destination)]
+            size = self.DensityCellSize(max(xs) - min(xs), max(ys) - min(ys), len(segments))
+            extent = sum(max(abs(s.destination.x - s.origin.x), abs(s.destination.y - s.origin.y))
+                         for s in segments) / len(segments)
+            self.cell_size = max(size, extent)
+        for segment in segments:
+            self.Store(segment)
+
+    def Nearest(self, x, y):
+        # Returns the segment closest to (x, y), or None if the grid is empty. A segment stored in several cells is
+        # measured only once.
+        if not self.positions:
+            return None
+        best = None
+        best_distance = math.inf
+        for segment in self.large:
+            distance = SegmentDistance(segment, x, y)
+            if distance < best_distance:
+                best_distance = distance
+                best = segment
+        if self.cells:
+            seen = set()
+            for r, ring in self.Rings(*self.Cell(x, y)):
+                for cell in ring:
+                    for segment in cell:
+                        if segment not in seen:
+                            seen.add(segment)
+                            distance = SegmentDistance(segment, x, y)
+                            if distance < best_distance:
+                                best_distance = distance
+                                best = segment
+                # A segment first met in a later ring has no point closer than r * cell_size to (x, y).
+                if best is not None and best_distance <= r * self.cell_size:
+                    break
+        return best
+
+    def InRectangle(self, x_min, y_min, x_max, y_max):
+        # Returns the segments with some point inside the rectangle from (x_min, y_min) to (x_max, y_max),
+        # borders included, each one once.
+        found = {}
+        for cell in self.CellsInBox(x_min, y_min, x_max, y_max):
+            for segment in cell:
+                if segment not in found and SegmentMeetsRectangle(segment, x_min, y_min, x_max, y_max):
+                    found[segment] = None
+        for segment in self.large:
+            if SegmentMeetsRectangle(segment, x_min, y_min, x_max, y_max):
+                found[segment] = None
+        return list(found)
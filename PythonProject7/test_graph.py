@@ -91,6 +91,34 @@ n = GetClosest(G1, 15, 5)  # Finds the closest node to coordinates (15, 5)
 print(n.name)  # Expected output: "J", which is the closest node
 n = GetClosest(G1, 8, 19)  # Finds the closest node to coordinates (8, 19)
 print(n.name)  # Expected output: "B", which is the closest node
+print([n.name for n in GetKClosest(G1, 15, 5, 3)])  # Expected output: ['J', 'H', 'I'], the three closest nodes
+print([n.name for n in GetNodesInRadius(G1, 15, 5, 5.5)])  # Expected output: ['J', 'H'], the nodes within 5.5 units
+print(G1.InDegree("G"), G1.OutDegree("G"))  # Expected output: 3 3, segments arriving at and leaving "G"
+print([n.name for n in G1.GetPredecessors("G")])  # Expected output: ['B', 'C', 'D'], the nodes pointing to "G"
+DeleteNode(G1, "G")  # Deletes "G" together with its six segments
+print(G1.InDegree("F"), len(G1.segments))  # Expected output: 3 19
+print([n.name for n in G1.GetNodeByName("B").neighbors])  # Expected output: ['A', 'C', 'F', 'K']
+n = GetClosest(G1, 15, 5)  # Computed again because the graph changed
+n = GetClosest(G1, 15, 5)  # Answered from the cache
+print(n.name, G1.GetCacheStats()["hits"])  # Expected output: J 1
+print(AddNodes(G1, [Node("X", 0, 0), Node("Y", 1, 1)]), len(G1.nodes))  # Expected output: True 13
+print(AddSegments(G1, ["XY", "YZ"], ["X", "Y"], ["Y", "Z"]), len(G1.segments))  # Expected output: False 19, "Z" does not exist so nothing is added
+print(AddSegments(G1, ["XY", "YX"], ["X", "Y"], ["Y", "X"]), len(G1.segments))  # Expected output: True 21
+print(AreConnected(G1, "A", "L"), AreConnected(G1, "A", "X"))  # Expected output: True False, "X" and "Y" are apart
+AddSegment(G1, "XA", "X", "A")  # The components are updated without being rebuilt
+print(AreConnected(G1, "A", "Y"), CountComponents(G1))  # Expected output: True 1
+DeleteSegment(G1, "XA")  # The next query rebuilds the components
+print(AreConnected(G1, "A", "Y"), CountComponents(G1))  # Expected output: False 2
+print(GetStronglyConnectedComponents(G1)[-1])  # Expected output: ['X', 'Y'], they reach each other
+print(GetClosestSegment(G1, 4, 4.2).id)  # Expected output: EF, the segment passing closest to (4, 4.2)
+print(sorted(s.id for s in GetSegmentsInRectangle(G1, 17, 0, 20, 16)))  # Expected output: ['CD', 'DH', 'DI', 'ID', 'IJ', 'JI']
+print(sorted(n.name for n in GetNodesInRectangle(G1, 5, 12, 0, 0)))  # Expected output: ['E', 'L', 'X', 'Y'], corners in any order
+AddNodes(G1, [Node("FA", 1000000, 1000000), Node("FB", 1000001, 1000000)])  # A segment far away from the rest
+AddSegment(G1, "FAFB", "FA", "FB")  # Stretches the segment index, which is rebuilt with larger cells
+print(GetClosestSegment(G1, 900000, 900000).id, GetClosestSegment(G1, 4, 4.2).id)  # Expected output: FAFB EF
+DeleteNode(G1, "FA")  # Also deletes "FAFB"; the next query trims the index back to the other segments
+s = GetClosestSegment(G1, 900000, 900000)
+print("C" in (s.origin.name, s.destination.name))  # Expected output: True, "C" is the node closest to the query
 
 
 print("Probando el segundo grafo...")  # Testing the second graph
@@ -101,3 +129,95 @@ print("Testing LoadGraphFromFile...")  # Testing graph loading from a file
 G = LoadGraphFromFile("graph_data.txt")  # Loads a graph from a file
 Plot(G)  # Plots the graph loaded from the file
 
+
+
+print("Testing instrumentation...")  # Timing the loader with the instrumentation enabled
+from instrument import Profiling
+with Profiling() as profile:
+   G = LoadGraphFromFile("graph_data.txt")
+print(profile.GetStats("LoadGraphFromFile").calls)  # Expected output: 1
+print(profile.GetStats("StreamGraphFromFile").items)  # Expected output: 11, the lines read from the file
+print(profile.GetStats("AddNode").calls)  # Expected output: 4, one per node of the file
+with Profiling(reset=False) as profile:
+   stats = profile.GetStats("AddNode")
+   AddNode(G, Node("Extra", 0, 0))  # Recorded, but the copy taken before does not change
+   stats.calls = 0  # Changing the copy does not touch the recorded statistics either
+print(stats.calls, profile.GetStats("AddNode").calls)  # Expected output: 0 5
+DeleteNode(G, "Extra")
+
+
+
+print("Testing SaveGraphToFile and the binary format...")  # Saving G1 and reading it back in both formats
+import os
+import tempfile
+from graph_binary import SaveGraphToBinary, LoadGraphFromBinary, OpenGraphBinary
+with tempfile.TemporaryDirectory() as folder:
+   text_path = os.path.join(folder, "g1.txt")
+   binary_path = os.path.join(folder, "g1.bin")
+   print(SaveGraphToFile(G1, text_path), SaveGraphToBinary(G1, binary_path))  # Expected output: True True
+   for copy in (LoadGraphFromFile(text_path), LoadGraphFromBinary(binary_path)):
+      print([(n.name, n.x, n.y) for n in copy.nodes] == [(n.name, n.x, n.y) for n in G1.nodes],
+            [(s.id, s.origin.name, s.destination.name, s.cost) for s in copy.segments] ==
+            [(s.id, s.origin.name, s.destination.name, s.cost) for s in G1.segments])  # Expected output: True True (twice)
+   O = Graph()  # Segments not grouped by origin: the files keep the order in which they were added
+   AddNodes(O, [Node("A", 0, 0), Node("B", 1, 0), Node("C", 0, 1)])
+   AddSegments(O, ["BA", "AB", "CA", "AC"], ["B", "A", "C", "A"], ["A", "B", "A", "C"])
+   SaveGraphToBinary(O, binary_path)
+   O2 = LoadGraphFromBinary(binary_path)
+   SaveGraphToFile(O2, text_path)  # A text file saved after a binary load keeps the order too
+   print([s.id for s in O2.segments], [s.id for s in LoadGraphFromFile(text_path).segments])  # Expected output: ['BA', 'AB', 'CA', 'AC'] ['BA', 'AB', 'CA', 'AC']
+   SaveGraphToBinary(G1, binary_path)
+   S = OpenGraphBinary(binary_path)  # Names are looked up by binary search in the mapped file
+   print(S.IndexOf("C"), S.names[S.IndexOf("C")], S.IndexOf("G"), len(S.segment_ids))  # Expected output: 2 C None 21
+   with open(binary_path, 'rb') as file:
+      data = file.read()
+   with open(binary_path, 'wb') as file:
+      file.write(data[:100])  # Cuts the file in the middle of its arrays
+   print(LoadGraphFromBinary(binary_path))  # Expected output: Error loading graph: '.../g1.bin' is truncated None
+   open(binary_path, 'wb').close()
+   print(LoadGraphFromBinary(binary_path))  # Expected output: Error loading graph: '.../g1.bin' is not a binary graph file None
+   print(LoadGraphFromBinary(text_path))  # Expected output: Error loading graph: '.../g1.txt' is not a binary graph file None
+
+
+
+print("Testing malformed lines...")  # Bad lines are skipped and reported with their line number
+with tempfile.TemporaryDirectory() as folder:
+   bad_path = os.path.join(folder, "bad.txt")
+   with open(bad_path, 'w') as file:
+      file.write("Nodes:\nA,1,2\nB,3\nC,x,4\nA,5,6\nD,7,8\nSegments:\nAD,A,D\nAD,D,A\nAZ,A,Z\nAD2,A,D,1\n")
+   B, report = StreamGraphFromFile(bad_path)
+   print(report.nodes, report.segments, report.error_count)  # Expected output: 2 1 6
+   for error in report.errors:
+      print(error)
+   # Expected output:
+   # (3, 'B,3', 'expected 3 fields, found 2')
+   # (4, 'C,x,4', 'coordinates are not numbers')
+   # (5, 'A,5,6', 'duplicate node name')
+   # (9, 'AD,D,A', 'duplicate segment id')
+   # (10, 'AZ,A,Z', 'unknown origin or destination node')
+   # (11, 'AD2,A,D,1', 'expected 3 fields, found 4')
+   with open(bad_path, 'w') as file:
+      file.write("Nodes:\nA,1,2\nA,3,4\nB,x,1\nC,1\n")  # The duplicate is only found when the nodes are inserted
+   B, report = StreamGraphFromFile(bad_path, max_errors=2)
+   print([error[0] for error in report.errors], report.error_count)  # Expected output: [3, 4] 3, the first two by line
+
+
+
+print("Testing headless export...")  # Rendering to image files without opening any window
+from export import RenderGraph, RenderNode, RenderBatch, RenderJob
+with tempfile.TemporaryDirectory() as folder:
+   print(RenderGraph(G, os.path.join(folder, "graph.png"), width=640, height=480))  # Expected output: True
+   print(RenderNode(G, "B", os.path.join(folder, "node.svg"), viewport=(0, 20, 0, 20)))  # Expected output: True
+   print(RenderNode(G, "Z", os.path.join(folder, "missing.png")))  # Expected output: Node 'Z' does not exist in the graph. False
+   jobs = [RenderJob(G, os.path.join(folder, f"view{i}.png"), width=200, height=200) for i in range(3)]
+   print(RenderBatch(jobs, processes=1), sorted(os.listdir(folder))[-3:])  # Expected output: [True, True, True] ['view0.png', 'view1.png', 'view2.png']
+   import random
+   random.seed(5)  # A graph whose segments are not grouped by origin, drawn by worker processes and without them
+   R = Graph()
+   AddNodes(R, [Node(str(i), random.uniform(0, 10), random.uniform(0, 10)) for i in range(30)])
+   pairs = [(str(random.randrange(30)), str(random.randrange(30))) for _ in range(120)]
+   AddSegments(R, [f"s{k}" for k in range(120)], [a for a, _ in pairs], [b for _, b in pairs])
+   for tag, processes in (("serial", 1), ("parallel", 2)):
+      RenderBatch([RenderJob(R, os.path.join(folder, f"{tag}{i}.png"), width=300, height=300) for i in range(2)], processes)
+   images = [[open(os.path.join(folder, f"{tag}{i}.png"), 'rb').read() for i in range(2)] for tag in ("serial", "parallel")]
+   print(images[0] == images[1])  # Expected output: True, the workers draw the segments in the same order
@@ -4,6 +4,6 @@ n2 = Node ('bbb', 3, 4)
 print (Distance(n1,n2))
 print (AddNeighbor(n1, n2))
 print (AddNeighbor(n1, n2))
-print (n1.__dict__)
+print ({attribute: getattr(n1, attribute) for attribute in Node.__slots__})
 for n in n1.neighbors:
-   print ( n.__dict__)
+   print ({attribute: getattr(n, attribute) for attribute in Node.__slots__})
@@ -0,0 +1,68 @@
+from graph import *
+from path import *
+# Importing the graph functions and the path-finding module.
+# The graph stored in 'graph_data.txt' is a chain A -> B -> C -> D.
+
+
+G = LoadGraphFromFile("graph_data.txt")
+
+p = Dijkstra(G, "A", "D")  # Finds the cheapest route from "A" to "D" with Dijkstra
+print(p.GetNodeNames())  # Expected output: ['A', 'B', 'C', 'D']
+print(p.segment_ids)  # Expected output: ['AB', 'BC', 'CD']
+print(round(p.cost, 2))  # Expected output: 26.53, the sum of the three segment costs
+print(p.expanded)  # Expected output: 4, every node had to be settled
+
+p = AStar(G, "A", "D")  # Same route found with A*
+print(p.GetNodeNames(), round(p.cost, 2))  # Expected output: ['A', 'B', 'C', 'D'] 26.53
+
+print(Dijkstra(G, "D", "A"))  # Expected output: None, segments are directed so "A" cannot be reached from "D"
+print(AStar(G, "A", "Z"))  # Expected output: None, node "Z" does not exist
+
+S = G.Freeze()  # Frozen CSR snapshot of the graph
+print(S.GetNeighbors(S.IndexOf("B")))  # Expected output: [2], the index of node "C"
+p = Dijkstra(S, "A", "D")  # The searches also run on the snapshot arrays
+print(p.GetNodeNames(), p.segment_ids)  # Expected output: ['A', 'B', 'C', 'D'] ['AB', 'BC', 'CD']
+print(S.names[S.GetClosest(9, 13)])  # Expected output: B, the closest node to (9, 13)
+
+# Isochrones: every node reachable within a budget, with the cost of its cheapest route from the nearest origin.
+print({name: round(cost, 2) for name, cost in ReachableWithin(G, "A", 20).items()})  # Expected output: {'A': 0.0, 'B': 8.94, 'C': 12.11}
+print(list(ReachableWithin(G, ["A", "C"], 10)))  # Expected output: ['A', 'C', 'B']
+print(ReachableWithin(S, ["D"], 100))  # Expected output: {'D': 0.0}, no segment leaves "D"
+
+from hierarchy import PrepareHierarchy
+# A contraction hierarchy answers the Dijkstra queries of the graph until it changes.
+H = PrepareHierarchy(G)
+p = Dijkstra(G, "A", "D")
+print(p.GetNodeNames(), round(p.cost, 2), H.IsStale(G))  # Expected output: ['A', 'B', 'C', 'D'] 26.53 False
+print(H.FindPath("D", "A"))  # Expected output: None
+import os
+import shutil
+import tempfile
+with tempfile.TemporaryDirectory() as folder:
+    # A hierarchy saved next to a graph file is only reused for a graph that was not edited after loading it.
+    path = shutil.copy("graph_data.txt", os.path.join(folder, "graph_data.txt"))
+    PrepareHierarchy(LoadGraphFromFile(path), path)  # Built and saved next to the file
+    G3 = LoadGraphFromFile(path)
+    print(PrepareHierarchy(G3, path).IsStale(G3), Dijkstra(G3, "A", "C").segment_ids)  # Expected output: False ['AB', 'BC'], read from the file
+    DeleteSegment(G3, "BC")
+    AddSegment(G3, "BA", "B", "A")  # Same number of nodes and segments as the file
+    PrepareHierarchy(G3, path)  # Built again: the saved one does not fit the edited graph
+    print(Dijkstra(G3, "A", "C"))  # Expected output: None, "BC" no longer exists
+
+from sharedgraph import PublishGraph, AttachGraph
+# A snapshot published in shared memory can be attached by name from any process without copying it.
+shared = PublishGraph(G)
+reader = AttachGraph(shared.name)
+S2 = reader.snapshot
+print(S2.names[S2.GetClosest(14, 4)], S2.GetNeighbors(S2.IndexOf("C")))  # Expected output: D [3]
+del S2  # The snapshot arrays must be released before the block is closed
+reader.Close()
+shared.Close()
+shared.Unlink()
+
+from routing import BatchRoute, CostMatrix
+# Batch routing: one search per origin, run in worker processes when there are several origins.
+if __name__ == "__main__":
+    print(sorted((o, d, round(c, 2)) for o, d, c in BatchRoute(G, [("A", "D"), ("A", "C"), ("B", "D")], processes=1)))
+    # Expected output: [('A', 'C', 12.11), ('A', 'D', 26.53), ('B', 'D', 17.58)]
+    print(CostMatrix(G, ["A", "D"], ["B", "A"], processes=2))  # Expected output: [[8.94427190999916, 0.0], [None, None]]
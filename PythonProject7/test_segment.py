@@ -1,3 +1,4 @@
+import random
 from node import *
 from segment import *
 # Importing the Node and Segment classes. These classes define the behavior
@@ -18,3 +19,10 @@ segment = Segment(n1, n2)
 print(f"Origen:{segment.origin.name}")  # Displays the name of the origin node (n1)
 print(f"Destí: {segment.destination.name}")  # Displays the name of the destination node (n2)
 print(f"Cost: {segment.cost}")  # Displays the cost of the segment, which is the Euclidean distance between n1 and n2
+
+
+# Costs computed in bulk (as AddSegments does) must be exactly the ones Distance gives
+random.seed(7)
+nodes = [Node(str(i), random.uniform(-1000, 1000), random.uniform(-1000, 1000)) for i in range(10000)]
+bulk = BuildSegments(nodes[:-1], nodes[1:])
+print(all(s.cost == Distance(s.origin, s.destination) for s in bulk))  # Expected output: True